@@ -0,0 +1,332 @@
+from typing import Any, Awaitable, Callable, Dict, Literal, NamedTuple, Optional
+from concurrent.futures import Executor
+from threading import Event, Lock, Thread
+import asyncio
+import time
+
+from scheduler import DeadlineScheduler
+
+
+class SensorSample(NamedTuple):
+    values: Dict[str, Any]
+    timestamp: float
+
+
+class SensorState:
+    """Latest sample from each sensor, shared between acquisition workers.
+
+    Workers publish whenever their device produces data; consumers take a
+    snapshot and merge the newest values into one reading.
+    """
+
+    def __init__(self) -> None:
+        self._lock: Lock = Lock()
+        self._samples: Dict[str, SensorSample] = {}
+
+    def publish(
+        self, sensor: str, values: Dict[str, Any], timestamp: Optional[float] = None
+    ) -> None:
+        sample = SensorSample(values, time.time() if timestamp is None else timestamp)
+        with self._lock:
+            self._samples[sensor] = sample
+
+    def discard(self, sensor: str) -> None:
+        """Forget a sensor's sample so stale values are never merged again"""
+        with self._lock:
+            self._samples.pop(sensor, None)
+
+    def get(self, sensor: str) -> Optional[SensorSample]:
+        with self._lock:
+            return self._samples.get(sensor)
+
+    def snapshot(self) -> Dict[str, SensorSample]:
+        with self._lock:
+            return dict(self._samples)
+
+    def merged(self) -> Dict[str, Any]:
+        """Newest value of every field across all sensors"""
+        values: Dict[str, Any] = {}
+        for sample in self.snapshot().values():
+            values.update(sample.values)
+        return values
+
+
+class Versioned(NamedTuple):
+    seq: int
+    value: Any
+
+
+class LatestValue:
+    """Newest value from a single publisher, readable without locking.
+
+    publish() builds a new immutable (seq, value) pair and swaps it in with
+    one reference assignment, which is atomic under the GIL, so readers
+    always see a consistent pair and never wait on the writer. `seq`
+    increases with every publish, letting consumers cheaply skip work
+    when nothing changed.
+    """
+
+    def __init__(self, value: Any = None) -> None:
+        self._current: Versioned = Versioned(0, value)
+
+    def publish(self, value: Any) -> int:
+        seq = self._current.seq + 1
+        self._current = Versioned(seq, value)
+        return seq
+
+    def get(self) -> Versioned:
+        return self._current
+
+    @property
+    def value(self) -> Any:
+        return self._current.value
+
+    @property
+    def seq(self) -> int:
+        return self._current.seq
+
+
+BreakerState = Literal["closed", "open", "half_open"]
+
+
+class BreakerStats(NamedTuple):
+    state: BreakerState
+    failures: int  # Total failed reads
+    consecutive_failures: int
+    trips: int  # Times the breaker has opened
+    recoveries: int  # Times a read succeeded after the breaker opened
+    retry_in: float
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker with exponential backoff for one device.
+
+    After `threshold` consecutive failures the breaker opens and no reads
+    are attempted for `base_delay` seconds. It then goes half-open and lets
+    one trial read through: success closes it again, failure reopens it
+    with the delay doubled, up to `max_delay`.
+    """
+
+    def __init__(
+        self, threshold: int = 3, base_delay: float = 1.0, max_delay: float = 60.0
+    ) -> None:
+        self.threshold: int = threshold
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.failures: int = 0
+        self.consecutive_failures: int = 0
+        self.trips: int = 0
+        self.recoveries: int = 0
+        self._opened: bool = False
+        self._backoff: int = 0
+        self._retry_at: float = 0.0
+
+    @property
+    def state(self) -> BreakerState:
+        if not self._opened:
+            return "closed"
+        return "open" if time.monotonic() < self._retry_at else "half_open"
+
+    def retry_in(self) -> float:
+        """Seconds until a read may be attempted"""
+        if not self._opened:
+            return 0.0
+        return max(self._retry_at - time.monotonic(), 0.0)
+
+    def record_success(self) -> bool:
+        """Close the breaker; True if this was a recovery from open"""
+        self.consecutive_failures = 0
+        self._backoff = 0
+        if not self._opened:
+            return False
+        self._opened = False
+        self.recoveries += 1
+        return True
+
+    def record_failure(self) -> Optional[float]:
+        """Count a failure; returns the backoff delay if the breaker opened"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        if not self._opened and self.consecutive_failures < self.threshold:
+            return None
+
+        delay = min(self.base_delay * 2**self._backoff, self.max_delay)
+        self._backoff += 1
+        self._opened = True
+        self._retry_at = time.monotonic() + delay
+        self.trips += 1
+        return delay
+
+    def stats(self) -> BreakerStats:
+        return BreakerStats(
+            state=self.state,
+            failures=self.failures,
+            consecutive_failures=self.consecutive_failures,
+            trips=self.trips,
+            recoveries=self.recoveries,
+            retry_in=self.retry_in(),
+        )
+
+
+SensorRead = Callable[[], Optional[Dict[str, Any]]]
+
+
+class SensorWorker:
+    """Polls one sensor on its own thread at the sensor's native cadence.
+
+    `read` returns a dict of field values, or None when the device has no
+    new data; results are published to `state` under `name`. A slow or
+    failing device only delays its own worker. Reads are paced on fixed
+    deadlines every `interval` seconds; an interval of 0 reads back to back
+    for devices whose read already blocks until data arrives. Repeated
+    failures open `breaker`, which backs the worker off exponentially. With
+    `max_age`, going that many seconds without new data also counts as a
+    failure, for devices that fall silent instead of raising.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        read: SensorRead,
+        interval: float,
+        state: SensorState,
+        breaker: Optional[CircuitBreaker] = None,
+        max_age: Optional[float] = None,
+    ) -> None:
+        self.name: str = name
+        self.read: SensorRead = read
+        self.interval: float = interval
+        self.state: SensorState = state
+        self.breaker: CircuitBreaker = breaker or CircuitBreaker()
+        self.max_age: Optional[float] = max_age
+        self._data_at: float = time.monotonic()
+        self.scheduler: Optional[DeadlineScheduler] = (
+            DeadlineScheduler(interval) if interval > 0 else None
+        )
+        self._stop: Event = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        self._data_at = time.monotonic()
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def available(self) -> bool:
+        """False while the breaker is open and the device's data is suspect"""
+        return self.breaker.state != "open"
+
+    def poll(self) -> bool:
+        """Read once and publish the result; False if the read failed"""
+        try:
+            values = self.read()
+            if values is None and self.max_age is not None:
+                silent = time.monotonic() - self._data_at
+                if silent > self.max_age:
+                    raise RuntimeError(f"no new data for {silent:.0f} s")
+        except Exception as e:
+            print(f"{self.name} error: {e}")
+            delay = self.breaker.record_failure()
+            if delay is not None:
+                self.state.discard(self.name)
+                print(f"{self.name} circuit open, retrying in {delay:.0f} s")
+            return False
+
+        if self.breaker.record_success():
+            print(f"{self.name} recovered")
+        if values is not None:
+            self._data_at = time.monotonic()
+            self.state.publish(self.name, values)
+        return True
+
+    def _run(self) -> None:
+        if self.scheduler is not None:
+            self.scheduler.reset()
+        while not self._stop.is_set():
+            backoff = self.breaker.retry_in()
+            if backoff > 0:
+                if self._stop.wait(backoff):
+                    break
+                if self.scheduler is not None:
+                    self.scheduler.reset()
+
+            if not self.poll() and self.scheduler is None:
+                self._stop.wait(1)
+            if self.scheduler is not None:
+                self.scheduler.wait(self._stop)
+
+
+async def wait_or_stop(stop: asyncio.Event, timeout: float) -> None:
+    """Sleep for `timeout` seconds, waking early once `stop` is set"""
+    try:
+        await asyncio.wait_for(stop.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def poll_sensor_async(
+    worker: SensorWorker, stop: asyncio.Event, executor: Optional[Executor] = None
+) -> None:
+    """Coroutine version of a SensorWorker's loop for the asyncio runtime.
+
+    The blocking I2C/serial read runs in `executor`, so many sensors can
+    share a small pool instead of holding a thread each while idle.
+    """
+    loop = asyncio.get_running_loop()
+    scheduler = worker.scheduler
+    if scheduler is not None:
+        scheduler.reset()
+    while not stop.is_set():
+        backoff = worker.breaker.retry_in()
+        if backoff > 0:
+            await wait_or_stop(stop, backoff)
+            if scheduler is not None:
+                scheduler.reset()
+            continue
+
+        ok = await loop.run_in_executor(executor, worker.poll)
+        if not ok and scheduler is None:
+            await wait_or_stop(stop, 1)
+
+        if scheduler is not None:
+            await wait_or_stop(stop, scheduler.next_delay())
+            scheduler.tick()
+        else:
+            # Still yield to the loop between back-to-back reads
+            await asyncio.sleep(0)
+
+
+AsyncSinkCallback = Callable[[Any], Awaitable[None]]
+
+
+class AsyncSink:
+    """Feeds items to an async callback through a bounded queue.
+
+    When the callback falls behind, the oldest queued item is dropped so a
+    slow publisher never holds up acquisition.
+    """
+
+    def __init__(self, callback: AsyncSinkCallback, queue_size: int = 64) -> None:
+        self.callback: AsyncSinkCallback = callback
+        self.dropped: int = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def put(self, item: Any) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(item)
+
+    async def run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                await self.callback(item)
+            except Exception as e:
+                print(f"Sink error: {e}")
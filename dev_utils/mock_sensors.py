@@ -2,6 +2,7 @@
 from dataclasses import dataclass
 from typing import Tuple, Optional
 import random
+import struct
 import time
 
 
@@ -45,17 +46,34 @@ class MockSCD4x:
         self._humidity_base = 45.0  # typical indoor humidity
         self._measuring = False
         self._error_rate = 0.01
+        self._period = 5.0  # periodic mode produces a sample every 5 s
+        self._next_sample = 0.0
 
     def start_periodic_measurement(self) -> None:
         self._measuring = True
+        self._next_sample = time.time() + self._period
 
     def stop_periodic_measurement(self) -> None:
         self._measuring = False
 
-    def measure(self) -> Optional[Tuple[int, float, float, float]]:
+    def data_ready(self) -> bool:
+        return self._measuring and time.time() >= self._next_sample
+
+    def measure(
+        self, blocking: bool = True, timeout: float = 10
+    ) -> Optional[Tuple[int, float, float, float]]:
         if not self._measuring:
             return None
 
+        t_start = time.time()
+        while not self.data_ready():
+            if not blocking:
+                return None
+            if time.time() - t_start > timeout:
+                raise RuntimeError("Timeout waiting for data ready.")
+            time.sleep(0.1)
+        self._next_sample += self._period
+
         if random.random() < self._error_rate:
             raise RuntimeError("Mock SCD4x read error")
 
@@ -81,7 +99,7 @@ class MockPMSData:
 
 
 class MockPMS5003:
-    def __init__(self):
+    def __init__(self, device="/dev/ttyAMA0", baudrate=9600):
         self._data = MockPMSData()
         self._error_rate = 0.01  # 1% chance of read error
 
@@ -104,3 +122,48 @@ class MockPMS5003:
             raw_gt_ten_um=int(self._data.raw_gt_ten_um * variation),
         )
 
+
+
+def pms5003_frame(pm: Tuple[int, int, int], corrupt: bool = False) -> bytes:
+    """A 32-byte PMS5003 frame with standard and atmospheric PM set to `pm`"""
+    words = [*pm, *pm, 1200, 800, 500, 200, 50, 10, 0]
+    body = struct.pack(">13H", *words)
+    header = b"\x42\x4d" + struct.pack(">H", len(body) + 2)
+    checksum = sum(header) + sum(body) + (1 if corrupt else 0)
+    return header + body + struct.pack(">H", checksum & 0xFFFF)
+
+
+class MockSerial:
+    """Stands in for the PMS5003's pyserial port, streaming one frame a second"""
+
+    def __init__(self, port="/dev/ttyAMA0", baudrate=9600, timeout=4):
+        self.timeout = timeout
+        self._buffer = bytearray()
+        self._next_frame = time.time()
+        self._error_rate = 0.01  # 1% of frames fail their checksum
+
+    def _produce(self) -> None:
+        while time.time() >= self._next_frame:
+            variation = random.uniform(0.8, 1.2)
+            pm = tuple(int(v * variation) for v in MockPMSData.pm_ug_per_m3)
+            corrupt = random.random() < self._error_rate
+            self._buffer += pms5003_frame(pm, corrupt)
+            self._next_frame += 1.0
+
+    @property
+    def in_waiting(self) -> int:
+        self._produce()
+        return len(self._buffer)
+
+    def read(self, size: int = 1) -> bytes:
+        deadline = time.time() + self.timeout
+        self._produce()
+        while len(self._buffer) < size and time.time() < deadline:
+            time.sleep(min(0.05, max(0.0, self._next_frame - time.time())))
+            self._produce()
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def close(self) -> None:
+        pass
@@ -1,15 +1,153 @@
 from PIL import Image, ImageDraw, ImageFont
 from datetime import datetime
+import numpy as np
+import math
 import time
 
 LARGE_FONT = "./fonts/dejavu-sans/DejaVuSans-Bold.ttf"
 MEDIUM_FONT = "./fonts/dejavu-sans/DejaVuSans-Bold.ttf"
 SMALL_FONT = "./fonts/roboto/Roboto-Regular.ttf"
 
+# Reading pages in rotation order
+PAGES = ["co2", "tvoc", "pm2.5"]
+# Gauge position and size: x, y, width, height
+GAUGE = (10, 95, 108, 10)
+# Characters in the per-frame text, rasterised up front
+EMOTICONS = "☺😐☹"
+VALUE_CHARS = "0123456789-"
+STATS_CHARS = "0123456789-.:%°C"
+
+
+class GlyphAtlas:
+    """Pre-rasterised 1-bit glyphs for one font.
+
+    Each character is rendered through FreeType once per sub-pixel phase
+    and kept as a sprite with its bitmap offset; strings are composed by
+    pasting sprites at cached advance widths. The output matches
+    draw.text pixel for pixel for fonts without kerning, which covers the
+    digits and symbols on the display.
+    """
+
+    def __init__(self, font, charset: str = ""):
+        self.font = font
+        self._advances = {}
+        self._sprites = {}
+        for char in charset:
+            self._sprite(char, 0.0)
+
+    def advance(self, char: str) -> float:
+        advance = self._advances.get(char)
+        if advance is None:
+            advance = self._advances[char] = self.font.getlength(char)
+        return advance
+
+    def textlength(self, text: str) -> float:
+        return sum(self.advance(char) for char in text)
+
+    def _sprite(self, char: str, phase: float):
+        """(mask, offset) of `char` drawn at x = phase, or None if blank"""
+        key = (char, phase)
+        if key not in self._sprites:
+            left, top, right, bottom = self.font.getbbox(char)
+            origin = (max(-left, 0) + 1, max(-top, 0) + 1)
+            scratch = Image.new("1", (origin[0] + right + 2, origin[1] + bottom + 2))
+            ImageDraw.Draw(scratch).text(
+                (origin[0] + phase, origin[1]), char, font=self.font, fill=1
+            )
+            bbox = scratch.getbbox()
+            self._sprites[key] = bbox and (
+                scratch.crop(bbox),
+                (bbox[0] - origin[0], bbox[1] - origin[1]),
+            )
+        return self._sprites[key]
+
+    def draw(self, draw: ImageDraw.ImageDraw, xy, text: str) -> None:
+        """Draw `text` in white with its top-left origin at `xy`, like draw.text"""
+        x, y = xy
+        pen = math.floor(x)
+        phase = x - pen
+        for char in text:
+            sprite = self._sprite(char, phase)
+            if sprite:
+                mask, (dx, dy) = sprite
+                draw.bitmap((pen + dx, int(y) + dy), mask, fill=1)
+            pen += self.advance(char)
+
+
+class PartialUpdateDevice:
+    """Wraps an SH1106 device so only changed parts of a frame are sent.
+
+    The controller's memory is organised in 8-pixel-tall pages of one byte
+    per column. Each frame is packed into that layout and diffed against
+    the last one sent; only the changed column runs of each page go out,
+    with runs closer than `merge_gap` columns merged to save the 3 bytes of
+    addressing per segment. Devices without luma's page addressing, such
+    as the PNG-writing mock, are sent whole frames instead. Everything else
+    is delegated to the device.
+    """
+
+    def __init__(self, device, merge_gap: int = 4):
+        self.device = device
+        self.merge_gap = merge_gap
+        self._pages = None  # Last frame sent, as (pages, width) bytes
+        self.bytes_sent = 0
+        self.segments_sent = 0
+
+    def __getattr__(self, name):
+        return getattr(self.device, name)
+
+    def display(self, image) -> None:
+        """Send the parts of `image` that differ from the previous frame"""
+        device = self.device
+        if not hasattr(device, "preprocess"):
+            device.display(image)
+            return
+
+        image = device.preprocess(image)
+        width, height = image.size
+        # Column bytes per page, with the top row of each page in bit 0
+        bits = np.asarray(image, dtype=np.uint8).reshape(height // 8, 8, width)
+        pages = np.bitwise_or.reduce(bits << np.arange(8).reshape(1, 8, 1), axis=1)
+        pages = pages.astype(np.uint8)
+
+        if self._pages is None or self._pages.shape != pages.shape:
+            changed = np.ones(pages.shape, dtype=bool)
+        else:
+            changed = pages != self._pages
+
+        # The SH1106 maps a 128-column panel into its 132-column RAM from
+        # column 2; luma sets the attribute, anything else gets the default
+        offset = getattr(device, "_page_address_offset", 0x02)
+        for page in np.flatnonzero(changed.any(axis=1)):
+            for start, end in self._runs(np.flatnonzero(changed[page])):
+                column = offset + start
+                device.command(0xB0 + page, column & 0x0F, 0x10 | column >> 4)
+                device.data(pages[page, start:end].tolist())
+                self.bytes_sent += 3 + end - start
+                self.segments_sent += 1
+
+        self._pages = pages
+
+    def _runs(self, columns):
+        """Group sorted changed columns into [start, end) runs"""
+        start = prev = columns[0]
+        for column in columns[1:]:
+            if column - prev > self.merge_gap:
+                yield start, prev + 1
+                start = column
+            prev = column
+        yield start, prev + 1
+
 
 class DisplayManager:
     def __init__(self, device):
         self.device = device
+        self.page_interval = 4  # Seconds each page stays on screen
+        # Bytes of the last frame pushed to the device, to skip identical ones
+        self._last_frame = None
+        self.frames_rendered = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
         self.indicators = {
             "co2": {
                 "min": 400,
@@ -52,6 +190,17 @@ class DisplayManager:
             self.small_font = ImageFont.load_default()
             self.emoji_font = ImageFont.load_default()
 
+        # Per-frame text is composed from cached glyphs, not FreeType
+        self.large_glyphs = GlyphAtlas(self.large_font, VALUE_CHARS)
+        self.small_glyphs = GlyphAtlas(self.small_font, STATS_CHARS)
+        self.emoji_glyphs = GlyphAtlas(self.emoji_font, EMOTICONS)
+
+        # Static layers are drawn once; frames only add the changing parts
+        self._backgrounds = {
+            indicator_type: self._build_background(indicator_type)
+            for indicator_type in PAGES
+        }
+
     def _get_emoticon(self, value: float, indicator_type: str) -> str:
         """Return appropriate emoticon based on value range"""
         ranges = self.indicators[indicator_type]
@@ -65,27 +214,13 @@ class DisplayManager:
         else:
             return "☹"  # White frowning face
 
-    def _draw_horizontal_gauge(
-        self,
-        draw: ImageDraw.ImageDraw,
-        x: int,
-        y: int,
-        width: int,
-        height: int,
-        value: float,
-        indicator_type: str,
+    def _draw_gauge_frame(
+        self, draw: ImageDraw.ImageDraw, x: int, y: int, width: int, height: int
     ) -> None:
-        """Draw a horizontal gauge with normalized marker positions"""
-        ranges = self.indicators[indicator_type]
-        value_normalized = self._normalize_value(value, indicator_type)
-
+        """Draw the static parts of a horizontal gauge: outline, markers, labels"""
         # Draw base gauge rectangle
         draw.rectangle((x, y, x + width, y + height), outline=1)
 
-        # Draw current value fill
-        current_width = int(value_normalized * width)
-        draw.rectangle((x, y, x + current_width, y + height), fill=1)
-
         # Draw optimal and warning markers at fixed positions
         # Optimal marker at 33% and warning at 66% of width
         markers = [x + int(width * 0.33), x + int(width * 0.66)]
@@ -101,6 +236,21 @@ class DisplayManager:
             (x + width - poor_w, y + height + 6), "Poor", font=self.small_font, fill=1
         )
 
+    def _draw_gauge_fill(
+        self,
+        draw: ImageDraw.ImageDraw,
+        x: int,
+        y: int,
+        width: int,
+        height: int,
+        value: float,
+        indicator_type: str,
+    ) -> None:
+        """Fill a gauge up to the normalized value"""
+        value_normalized = self._normalize_value(value, indicator_type)
+        current_width = int(value_normalized * width)
+        draw.rectangle((x, y, x + current_width, y + height), fill=1)
+
     def _normalize_value(self, value: float, indicator_type: str) -> float:
         """Normalize value to 0-1 range using a logarithmic scale"""
         ranges = self.indicators[indicator_type]
@@ -112,8 +262,6 @@ class DisplayManager:
 
         # Use logarithmic normalization for CO2 (which has a larger range)
         if indicator_type == "co2":
-            import math
-
             min_log = math.log(min_val)
             max_log = math.log(max_val)
             value_log = math.log(value)
@@ -122,75 +270,99 @@ class DisplayManager:
         # Linear normalization for other values
         return (value - min_val) / (max_val - min_val)
 
-    def _draw_reading_page(
-        self, draw: ImageDraw.ImageDraw, reading, indicator_type: str
-    ) -> None:
-        """Draw a single reading page with large value and gauge"""
+    def _build_background(self, indicator_type: str) -> Image.Image:
+        """Render everything on a reading page that never changes"""
         ranges = self.indicators[indicator_type]
-        value = getattr(reading, indicator_type.replace(".", ""))
+        image = Image.new("1", (self.device.width, self.device.height), 0)
+        draw = ImageDraw.Draw(image)
+
+        # Draw divider line
+        draw.line((0, 20, 128, 20), fill=1)
 
         # Draw the metric name at the top
         name_w = draw.textlength(ranges["name"], font=self.font)
         draw.text((64 - name_w / 2, 25), ranges["name"], font=self.font, fill=1)
 
-        # Draw the large value in the center
-        value_text = f"{int(value)}"
-        value_w = draw.textlength(value_text, font=self.large_font)
+        # Draw the unit below the value
+        unit_w = draw.textlength(ranges["unit"], font=self.small_font)
+        draw.text((64 - unit_w / 2, 80), ranges["unit"], font=self.small_font, fill=1)
+
+        # Draw the gauge lower on the screen with more space above
+        self._draw_gauge_frame(draw, *GAUGE)
+        return image
+
+    def _draw_reading_page(
+        self, draw: ImageDraw.ImageDraw, reading, indicator_type: str
+    ) -> None:
+        """Draw the value, emoticon and gauge fill over a page background"""
+        value = getattr(reading, indicator_type.replace(".", ""))
+
+        # Draw the large value in the center, or a dash while the sensor is out
+        value_text = "--" if value is None else f"{int(value)}"
+        value_w = self.large_glyphs.textlength(value_text)
         
         # Get emoticon and its width
-        emoticon = self._get_emoticon(value, indicator_type)
-        emoticon_w = draw.textlength(emoticon, font=self.emoji_font)
+        emoticon = "" if value is None else self._get_emoticon(value, indicator_type)
+        emoticon_w = self.emoji_glyphs.textlength(emoticon)
         
         # Calculate total width and positions
         total_width = value_w + emoticon_w + 5  # 5 pixels spacing
         start_x = 64 - (total_width / 2)
         
         # Draw value and emoticon
-        draw.text((start_x, 40), value_text, font=self.large_font, fill=1)
-        draw.text((start_x + value_w + 5, 40), emoticon, font=self.emoji_font, fill=1)
+        self.large_glyphs.draw(draw, (start_x, 40), value_text)
+        self.emoji_glyphs.draw(draw, (start_x + value_w + 5, 40), emoticon)
 
-        # Draw the unit below the value
-        unit_w = draw.textlength(ranges["unit"], font=self.small_font)
-        draw.text((64 - unit_w / 2, 80), ranges["unit"], font=self.small_font, fill=1)
-
-        # Draw the gauge lower on the screen with more space above
-        self._draw_horizontal_gauge(draw, 10, 95, 108, 10, value, indicator_type)
+        if value is not None:
+            self._draw_gauge_fill(draw, *GAUGE, value, indicator_type)
 
     def _draw_top_stats(self, draw: ImageDraw.ImageDraw, reading) -> None:
         """Draw the constant top stats (temp, humidity, time) in white"""
         # Temperature on left
-        temp_str = f"{reading.temperature:.1f}°C"  # Using proper degree symbol
-        draw.text((2, 2), temp_str, font=self.small_font, fill=1)
+        temperature = (
+            "--" if reading.temperature is None else f"{reading.temperature:.1f}"
+        )
+        temp_str = f"{temperature}°C"  # Using proper degree symbol
+        self.small_glyphs.draw(draw, (2, 2), temp_str)
 
         # Time in center
         time_str = datetime.fromtimestamp(reading.timestamp).strftime("%H:%M")
-        time_w = draw.textlength(time_str, font=self.small_font)
-        draw.text((64 - time_w / 2, 2), time_str, font=self.small_font, fill=1)
+        time_w = self.small_glyphs.textlength(time_str)
+        self.small_glyphs.draw(draw, (64 - time_w / 2, 2), time_str)
 
         # Humidity on right
-        humid_str = f"{reading.humidity:.0f}%"
-        humid_w = draw.textlength(humid_str, font=self.small_font)
-        draw.text((126 - humid_w, 2), humid_str, font=self.small_font, fill=1)
+        humidity = "--" if reading.humidity is None else f"{reading.humidity:.0f}"
+        humid_str = f"{humidity}%"
+        humid_w = self.small_glyphs.textlength(humid_str)
+        self.small_glyphs.draw(draw, (126 - humid_w, 2), humid_str)
+
+    def next_page_in(self) -> float:
+        """Seconds until the page rotates"""
+        return self.page_interval - time.time() % self.page_interval
 
     def update(self, reading) -> None:
         """Update the display with new readings"""
-        page = int(time.time() / 4) % 3  # Rotate between 3 pages every 4 seconds
+        # Rotate between the pages every page_interval seconds
+        page = int(time.time() / self.page_interval) % len(PAGES)
 
-        image = Image.new("1", (self.device.width, self.device.height), 0)
+        indicator_type = PAGES[page]
+
+        # Start from the page's pre-rendered labels, divider and gauge frame
+        image = self._backgrounds[indicator_type].copy()
         draw = ImageDraw.Draw(image)
 
         # Draw stats at top
         self._draw_top_stats(draw, reading)
 
-        # Draw divider line
-        draw.line((0, 20, 128, 20), fill=1)
-
         # Draw the appropriate page based on current rotation
-        if page == 0:
-            self._draw_reading_page(draw, reading, "co2")
-        elif page == 1:
-            self._draw_reading_page(draw, reading, "tvoc")
-        else:
-            self._draw_reading_page(draw, reading, "pm2.5")
+        self._draw_reading_page(draw, reading, indicator_type)
+
+        self.frames_rendered += 1
+        frame = image.tobytes()
+        if frame == self._last_frame:
+            self.frames_skipped += 1
+            return
 
         self.device.display(image)
+        self._last_frame = frame
+        self.frames_sent += 1
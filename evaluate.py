@@ -2,8 +2,79 @@ import fire
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from datetime import datetime
 from typing import Literal
 
+from storage import EXTENSIONS, SegmentIndex, read_history
+
+
+PLOT_COLUMNS = ["timestamp", "temperature", "humidity", "co2", "tvoc", "eco2"]
+COLUMNAR_EXTENSIONS = (".parquet", ".arrow", ".feather")
+
+
+def _to_local_time(timestamps: pd.Series) -> pd.Series:
+    """Convert epoch seconds or UTC timestamps to naive local time, like the CSV"""
+    if not isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+        timestamps = pd.to_datetime(timestamps, unit="s", utc=True)
+    local_tz = datetime.now().astimezone().tzinfo
+    return timestamps.dt.tz_convert(local_tz).dt.tz_localize(None)
+
+
+def load_history(
+    path: str,
+    start: str | None = None,
+    end: str | None = None,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Load history from a CSV, binary, Gorilla, SQLite, Parquet or Arrow file, or
+    from a segment index, optionally limited to [start, end]. Columnar files
+    only read the requested `columns`.
+    """
+    first = datetime.fromisoformat(start).timestamp() if start else None
+    last = datetime.fromisoformat(end).timestamp() if end else None
+
+    if path.endswith(COLUMNAR_EXTENSIONS):
+        if path.endswith(".parquet"):
+            # Filters let Parquet skip whole row groups outside the range
+            filters = []
+            if first is not None:
+                filters.append(
+                    ("timestamp", ">=", pd.Timestamp(first, unit="s", tz="UTC"))
+                )
+            if last is not None:
+                filters.append(
+                    ("timestamp", "<=", pd.Timestamp(last, unit="s", tz="UTC"))
+                )
+            df = pd.read_parquet(path, columns=columns, filters=filters or None)
+        else:
+            df = pd.read_feather(path, columns=columns)
+            if first is not None:
+                df = df[df["timestamp"] >= pd.Timestamp(first, unit="s", tz="UTC")]
+            if last is not None:
+                df = df[df["timestamp"] <= pd.Timestamp(last, unit="s", tz="UTC")]
+        df["timestamp"] = _to_local_time(df["timestamp"])
+        return df
+
+    if not path.endswith(EXTENSIONS["csv"]):
+        # Range filtering happens in storage, so only overlapping data is read
+        if path.endswith(".json"):
+            records = SegmentIndex(path).read(first, last)
+        else:
+            records = read_history(path, first, last)
+
+        df = pd.DataFrame(records)
+        df["timestamp"] = _to_local_time(df["timestamp"])
+        return df
+
+    df = pd.read_csv(path, usecols=columns)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    if start:
+        df = df[df["timestamp"] >= pd.Timestamp(start)]
+    if end:
+        df = df[df["timestamp"] <= pd.Timestamp(end)]
+    return df
+
 
 def plot_environmental_data(
     csv_path: str,
@@ -11,15 +82,17 @@ def plot_environmental_data(
     style: Literal["darkgrid", "whitegrid", "dark", "white", "ticks"] = "whitegrid",
     color_palette: str = "husl",
     dpi: int = 300,
+    start: str | None = None,
+    end: str | None = None,
 ):
     """
-    Create environmental data plots from CSV and optionally save to file.
+    Create environmental data plots from any history file or segment index and
+    optionally save to file. `start` and `end` limit the plotted time range.
     """
     sns.set_theme(style=style)
     sns.set_palette(color_palette)
 
-    df = pd.read_csv(csv_path)
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df = load_history(csv_path, start, end, columns=PLOT_COLUMNS)
 
     fig = plt.figure(figsize=(15, 10), dpi=dpi)
     gs = fig.add_gridspec(2, 1, height_ratios=[1, 1], hspace=0.3)
@@ -0,0 +1,79 @@
+import fire
+import numpy as np
+from datetime import datetime
+from typing import Literal
+
+from storage import COLUMNS, SegmentIndex, read_history
+
+# Typed columns for columnar exports; counts fit in uint16 across the full
+# sensor ranges (TVOC reaches 60000 ppb, so int16 would overflow)
+COUNT_COLUMNS = ["co2", "tvoc", "eco2"]
+
+
+def history_table(records: np.ndarray):
+    """Build a pyarrow Table with typed columns from HISTORY_DTYPE records"""
+    import pyarrow as pa
+
+    arrays = {
+        "timestamp": pa.array(
+            np.round(records["timestamp"] * 1000).astype(np.int64),
+            type=pa.timestamp("ms", tz="UTC"),
+        )
+    }
+    for name in COLUMNS[1:]:
+        values = records[name]
+        missing = np.isnan(values)
+        if name in COUNT_COLUMNS:
+            arrays[name] = pa.array(
+                np.where(missing, 0, values).astype(np.uint16),
+                mask=missing,
+                type=pa.uint16(),
+            )
+        else:
+            arrays[name] = pa.array(values, mask=missing, type=pa.float32())
+    return pa.table(arrays)
+
+
+def export_history(
+    source: str,
+    output_path: str,
+    format: Literal["parquet", "arrow"] = "parquet",
+    start: str | None = None,
+    end: str | None = None,
+    row_group_rows: int = 86400,
+):
+    """
+    Convert history (any storage format, or a segment index) to Parquet or
+    Arrow IPC with typed columns and a real timestamp type.
+    """
+    try:
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            "Columnar export requires pyarrow: uv sync --group columnar"
+        ) from e
+
+    first = datetime.fromisoformat(start).timestamp() if start else None
+    last = datetime.fromisoformat(end).timestamp() if end else None
+    if source.endswith(".json"):
+        records = SegmentIndex(source).read(first, last)
+    else:
+        records = read_history(source, first, last)
+    table = history_table(records)
+
+    if format == "parquet":
+        # Day-sized row groups keep timestamp statistics useful for filtering
+        pq.write_table(
+            table, output_path, compression="zstd", row_group_size=row_group_rows
+        )
+    elif format == "arrow":
+        feather.write_feather(table, output_path, compression="zstd")
+    else:
+        raise ValueError(f"Unknown export format: {format}")
+
+    print(f"Exported {len(records)} rows to {output_path}")
+
+
+if __name__ == "__main__":
+    fire.Fire(export_history)
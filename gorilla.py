@@ -0,0 +1,194 @@
+from typing import Iterator, List, Sequence, Tuple
+import struct
+
+# Gorilla-style time-series compression (Pelkonen et al., VLDB 2015).
+# Timestamps are stored as delta-of-delta milliseconds and each column as
+# float32 values XORed with the previous value of the same column.
+
+# Delta-of-delta buckets: (prefix bits, prefix length, payload bits)
+_DOD_BUCKETS = [(0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12)]
+_DOD_FALLBACK = (0b1111, 4, 64)
+
+_FLOAT = struct.Struct("<f")
+_UINT = struct.Struct("<I")
+
+
+def _float_bits(value: float) -> int:
+    return _UINT.unpack(_FLOAT.pack(value))[0]
+
+
+def _bits_float(bits: int) -> float:
+    return _FLOAT.unpack(_UINT.pack(bits))[0]
+
+
+class BitWriter:
+    def __init__(self) -> None:
+        self._bytes: bytearray = bytearray()
+        self._acc: int = 0
+        self._nbits: int = 0
+
+    def write(self, value: int, nbits: int) -> None:
+        self._acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        self._nbits += nbits
+        while self._nbits >= 8:
+            self._nbits -= 8
+            self._bytes.append((self._acc >> self._nbits) & 0xFF)
+        self._acc &= (1 << self._nbits) - 1
+
+    def getvalue(self) -> bytes:
+        """Bytes written so far, with the last byte zero-padded"""
+        if self._nbits:
+            return bytes(self._bytes) + bytes([self._acc << (8 - self._nbits)])
+        return bytes(self._bytes)
+
+
+class BitReader:
+    def __init__(self, data: bytes) -> None:
+        self._data: bytes = data
+        self._pos: int = 0
+        self._acc: int = 0
+        self._nbits: int = 0
+
+    def read(self, nbits: int) -> int:
+        while self._nbits < nbits:
+            self._acc = (self._acc << 8) | self._data[self._pos]
+            self._pos += 1
+            self._nbits += 8
+        self._nbits -= nbits
+        value = self._acc >> self._nbits
+        self._acc &= (1 << self._nbits) - 1
+        return value
+
+    def read_signed(self, nbits: int) -> int:
+        value = self.read(nbits)
+        if value >= 1 << (nbits - 1):
+            value -= 1 << nbits
+        return value
+
+
+class GorillaEncoder:
+    """Streaming encoder for a block of (timestamp, values) rows.
+
+    Rows are compressed as they are added; finish() returns the encoded
+    block and resets the encoder so the next block starts from scratch.
+    Timestamps are kept to millisecond precision and values to float32.
+    """
+
+    def __init__(self, columns: int) -> None:
+        self.columns: int = columns
+        self.rows: int = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.rows = 0
+        self._bits: BitWriter = BitWriter()
+        self._time: int = 0
+        self._delta: int = 0
+        self._values: List[int] = [0] * self.columns
+        self._leading: List[int] = [-1] * self.columns
+        self._trailing: List[int] = [0] * self.columns
+
+    def add(self, timestamp: float, values: Sequence[float]) -> None:
+        bits = self._bits
+        millis = round(timestamp * 1000)
+
+        if self.rows == 0:
+            bits.write(millis, 64)
+            for i, value in enumerate(values):
+                self._values[i] = _float_bits(value)
+                bits.write(self._values[i], 32)
+            self._time = millis
+            self.rows = 1
+            return
+
+        delta = millis - self._time
+        self._write_dod(delta - self._delta)
+        self._time = millis
+        self._delta = delta
+
+        for i, value in enumerate(values):
+            current = _float_bits(value)
+            xor = current ^ self._values[i]
+            self._values[i] = current
+            if xor == 0:
+                bits.write(0, 1)
+                continue
+
+            leading = min(32 - xor.bit_length(), 31)
+            trailing = (xor & -xor).bit_length() - 1
+            if self._leading[i] >= 0 and (
+                leading >= self._leading[i] and trailing >= self._trailing[i]
+            ):
+                # Meaningful bits fit inside the previous window
+                length = 32 - self._leading[i] - self._trailing[i]
+                bits.write(0b10, 2)
+                bits.write(xor >> self._trailing[i], length)
+            else:
+                length = 32 - leading - trailing
+                bits.write(0b11, 2)
+                bits.write(leading, 5)
+                bits.write(length - 1, 5)
+                bits.write(xor >> trailing, length)
+                self._leading[i] = leading
+                self._trailing[i] = trailing
+
+        self.rows += 1
+
+    def finish(self) -> bytes:
+        data = self._bits.getvalue()
+        self._reset()
+        return data
+
+    def _write_dod(self, dod: int) -> None:
+        if dod == 0:
+            self._bits.write(0, 1)
+            return
+        for prefix, prefix_bits, payload_bits in _DOD_BUCKETS:
+            if -(1 << (payload_bits - 1)) <= dod < 1 << (payload_bits - 1):
+                break
+        else:
+            prefix, prefix_bits, payload_bits = _DOD_FALLBACK
+        self._bits.write(prefix, prefix_bits)
+        self._bits.write(dod, payload_bits)
+
+
+def decode_block(
+    data: bytes, rows: int, columns: int
+) -> Iterator[Tuple[float, List[float]]]:
+    """Stream (timestamp, values) rows back out of a block from GorillaEncoder"""
+    if rows == 0:
+        return
+
+    bits = BitReader(data)
+    millis = bits.read(64)
+    raw = [bits.read(32) for _ in range(columns)]
+    yield millis / 1000, [_bits_float(value) for value in raw]
+
+    delta = 0
+    leading = [0] * columns
+    trailing = [0] * columns
+    for _ in range(rows - 1):
+        if bits.read(1):
+            prefix_bits = 1
+            while prefix_bits < 4 and bits.read(1):
+                prefix_bits += 1
+            payload_bits = (
+                _DOD_BUCKETS[prefix_bits - 1][2]
+                if prefix_bits <= len(_DOD_BUCKETS)
+                else _DOD_FALLBACK[2]
+            )
+            delta += bits.read_signed(payload_bits)
+        millis += delta
+
+        for i in range(columns):
+            if not bits.read(1):
+                continue
+            if bits.read(1):
+                leading[i] = bits.read(5)
+                length = bits.read(5) + 1
+                trailing[i] = 32 - leading[i] - length
+            else:
+                length = 32 - leading[i] - trailing[i]
+            raw[i] ^= bits.read(length) << trailing[i]
+
+        yield millis / 1000, [_bits_float(value) for value in raw]
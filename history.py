@@ -0,0 +1,265 @@
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from collections import deque
+import numpy as np
+import math
+
+
+class RingBuffer:
+    """Preallocated struct-of-arrays ring buffer with zero-copy ordered views.
+
+    Each field of `dtype` gets its own array of twice the capacity and every
+    sample is written into both halves. The newest `n` samples are then always
+    one contiguous slice, so views come back oldest-first without copying.
+    Views alias the live buffer and are only stable until the next append.
+    """
+
+    def __init__(self, dtype: np.dtype, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        assert dtype.names is not None
+
+        self.dtype: np.dtype = dtype
+        self.capacity: int = capacity
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.zeros(2 * capacity, dtype=dtype[name]) for name in dtype.names
+        }
+        self._arrays = list(self.columns.values())
+        self._head: int = 0
+        self._count: int = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, values: Sequence[float]) -> None:
+        """Append one sample given in dtype field order"""
+        i = self._head
+        j = i + self.capacity
+        for column, value in zip(self._arrays, values):
+            column[i] = value
+            column[j] = value
+
+        self._head = (i + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def view(self, name: str, n: Optional[int] = None) -> np.ndarray:
+        """Return the newest `n` values of a field (all of them by default)"""
+        n = self._count if n is None else max(0, min(n, self._count))
+        end = self._head + self.capacity
+        return self.columns[name][end - n : end]
+
+    def window(
+        self,
+        name: str,
+        start: float,
+        end: Optional[float] = None,
+        key: str = "timestamp",
+    ) -> np.ndarray:
+        """Return the values of a field whose `key` lies within [start, end]"""
+        keys = self.view(key)
+        lo = int(np.searchsorted(keys, start, side="left"))
+        hi = len(keys) if end is None else int(np.searchsorted(keys, end, side="right"))
+        return self.view(name)[lo:hi]
+
+
+def rollup_dtype(fields: Sequence[str]) -> np.dtype:
+    """Record layout for a rollup bucket: start time, sample count, and each
+    field's mean/min/max with its count of valid (non-NaN) samples"""
+    layout = [("timestamp", "<f8"), ("count", "<u4")]
+    for field in fields:
+        layout += [
+            (f"{field}_mean", "<f4"),
+            (f"{field}_min", "<f4"),
+            (f"{field}_max", "<f4"),
+            (f"{field}_count", "<u4"),
+        ]
+    return np.dtype(layout)
+
+
+class RollupTier:
+    """Fixed-resolution aggregate of a metric stream, updated incrementally.
+
+    Samples (or finished buckets from a finer tier) are folded into the
+    current bucket as running sums, minima and maxima. When a sample lands
+    in a later bucket the current one is closed, stored in this tier's ring
+    buffer and passed on to `parent`, so tiers cascade 1 s -> 1 min -> 1 h
+    without ever rescanning raw data. NaN values are ignored, and each
+    field's mean is weighted by its own count of valid samples.
+    """
+
+    def __init__(
+        self,
+        resolution: float,
+        retention: int,
+        fields: Sequence[str],
+        parent: Optional["RollupTier"] = None,
+    ) -> None:
+        self.resolution: float = resolution
+        self.fields: List[str] = list(fields)
+        self.parent: Optional[RollupTier] = parent
+        self.buffer: RingBuffer = RingBuffer(rollup_dtype(fields), retention)
+
+        n = len(self.fields)
+        self._bucket: Optional[float] = None
+        self._count: int = 0
+        self._sums: np.ndarray = np.zeros(n)
+        self._weights: np.ndarray = np.zeros(n)
+        self._mins: np.ndarray = np.full(n, np.inf)
+        self._maxs: np.ndarray = np.full(n, -np.inf)
+
+    def add_sample(self, timestamp: float, values: Sequence[float]) -> None:
+        array = np.asarray(values, dtype=np.float64)
+        counts = (~np.isnan(array)).astype(np.int64)
+        self.add(timestamp, 1, counts, array, array, array)
+
+    def add(
+        self,
+        timestamp: float,
+        count: int,
+        counts: np.ndarray,
+        means: np.ndarray,
+        mins: np.ndarray,
+        maxs: np.ndarray,
+    ) -> None:
+        """Fold in `count` samples whose fields had `counts` valid values each"""
+        bucket = timestamp - timestamp % self.resolution
+        if self._bucket is not None and bucket != self._bucket:
+            self._close_bucket()
+        self._bucket = bucket
+
+        valid = (counts > 0) & ~np.isnan(means)
+        self._count += count
+        self._sums += np.where(valid, means * counts, 0.0)
+        self._weights += np.where(valid, counts, 0)
+        np.fmin(self._mins, mins, out=self._mins)
+        np.fmax(self._maxs, maxs, out=self._maxs)
+
+    def view(self, name: str, n: Optional[int] = None) -> np.ndarray:
+        return self.buffer.view(name, n)
+
+    def window(
+        self, name: str, start: float, end: Optional[float] = None
+    ) -> np.ndarray:
+        return self.buffer.window(name, start, end)
+
+    def _close_bucket(self) -> None:
+        assert self._bucket is not None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = self._sums / self._weights
+        mins = np.where(np.isinf(self._mins), np.nan, self._mins)
+        maxs = np.where(np.isinf(self._maxs), np.nan, self._maxs)
+
+        counts = self._weights.copy()
+        record = [self._bucket, self._count]
+        record += np.column_stack((means, mins, maxs, counts)).ravel().tolist()
+        self.buffer.append(record)
+        if self.parent is not None:
+            self.parent.add(self._bucket, self._count, counts, means, mins, maxs)
+
+        self._count = 0
+        self._sums[:] = 0.0
+        self._weights[:] = 0.0
+        self._mins[:] = np.inf
+        self._maxs[:] = -np.inf
+
+
+class WindowStats(NamedTuple):
+    mean: float
+    min: float
+    max: float
+    std: float
+    ewma: float
+    count: int
+
+
+class RollingWindow:
+    """Sliding time-window statistics for a set of metrics.
+
+    Mean and standard deviation come from running sums and sums of squares,
+    min and max from monotonic deques, and the EWMA uses the window length
+    as its time constant. Each sample is added and evicted once, so updates
+    are amortised O(1) and every query is O(1). NaN values are ignored.
+    """
+
+    def __init__(self, window: float, fields: Sequence[str]) -> None:
+        self.window: float = window
+        self.fields: List[str] = list(fields)
+        self._index: Dict[str, int] = {name: i for i, name in enumerate(fields)}
+
+        n = len(self.fields)
+        self._samples: Deque[Tuple[float, Sequence[float]]] = deque()
+        self._sums: List[float] = [0.0] * n
+        self._squares: List[float] = [0.0] * n
+        self._counts: List[int] = [0] * n
+        self._mins: List[Deque[Tuple[float, float]]] = [deque() for _ in range(n)]
+        self._maxs: List[Deque[Tuple[float, float]]] = [deque() for _ in range(n)]
+        self._ewma: List[float] = [math.nan] * n
+        self._ewma_time: List[float] = [0.0] * n
+
+    def add(self, timestamp: float, values: Sequence[float]) -> None:
+        self._samples.append((timestamp, values))
+        for i, value in enumerate(values):
+            if value != value:
+                continue
+
+            self._sums[i] += value
+            self._squares[i] += value * value
+            self._counts[i] += 1
+
+            mins = self._mins[i]
+            while mins and mins[-1][1] >= value:
+                mins.pop()
+            mins.append((timestamp, value))
+
+            maxs = self._maxs[i]
+            while maxs and maxs[-1][1] <= value:
+                maxs.pop()
+            maxs.append((timestamp, value))
+
+            if self._ewma[i] != self._ewma[i]:
+                self._ewma[i] = value
+            else:
+                dt = max(0.0, timestamp - self._ewma_time[i])
+                alpha = 1.0 - math.exp(-dt / self.window)
+                self._ewma[i] += alpha * (value - self._ewma[i])
+            self._ewma_time[i] = timestamp
+
+        self._evict(timestamp - self.window)
+
+    def stats(self, field: str) -> WindowStats:
+        i = self._index[field]
+        count = self._counts[i]
+        if count == 0:
+            return WindowStats(math.nan, math.nan, math.nan, math.nan, self._ewma[i], 0)
+
+        mean = self._sums[i] / count
+        variance = max(0.0, self._squares[i] / count - mean * mean)
+        return WindowStats(
+            mean=mean,
+            min=self._mins[i][0][1],
+            max=self._maxs[i][0][1],
+            std=math.sqrt(variance),
+            ewma=self._ewma[i],
+            count=count,
+        )
+
+    def _evict(self, cutoff: float) -> None:
+        samples = self._samples
+        while samples and samples[0][0] <= cutoff:
+            _, values = samples.popleft()
+            for i, value in enumerate(values):
+                if value != value:
+                    continue
+                self._counts[i] -= 1
+                if self._counts[i] == 0:
+                    # Reset instead of subtracting to stop rounding error piling up
+                    self._sums[i] = 0.0
+                    self._squares[i] = 0.0
+                else:
+                    self._sums[i] -= value
+                    self._squares[i] -= value * value
+
+        for extremes in (self._mins, self._maxs):
+            for queue in extremes:
+                while queue and queue[0][0] <= cutoff:
+                    queue.popleft()
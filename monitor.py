@@ -1,115 +1,319 @@
-from typing import NamedTuple, Deque, Optional
+from typing import Any, Dict, List, Literal, NamedTuple, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from threading import Thread, Lock
-from collections import deque
+from threading import Event, Thread, Lock
 import numpy as np
+import fire
+import asyncio
+import math
 import time
-import csv
+import os
 
 from pms5003 import PMS5003
+from pms_reader import PMS5003_DEVICE, PMS5003Reader, open_port
 from sgp30 import SGP30
 from scd4x import SCD4X
 from luma.oled.device import sh1106
-from display import DisplayManager
-
-
+from acquisition import (
+    AsyncSink,
+    AsyncSinkCallback,
+    BreakerStats,
+    LatestValue,
+    SensorState,
+    SensorWorker,
+    poll_sensor_async,
+    wait_or_stop,
+)
+from display import DisplayManager, PartialUpdateDevice
+from history import RingBuffer, RollingWindow, RollupTier, WindowStats
+from scheduler import DeadlineScheduler
+from storage import (
+    COLUMNS,
+    HISTORY_DTYPE,
+    INDEX_PATH,
+    WRITERS,
+    BackgroundWriter,
+    BatchedWriter,
+    FullPolicy,
+    SegmentIndex,
+    SegmentedWriter,
+    StorageFormat,
+    WriterStats,
+    history_path,
+    latest_history_file,
+    recover,
+    tail_previous,
+)
+
+
+# Fields are None when their sensor has not reported yet or its circuit
+# breaker is open; history stores them as NaN
 class AirQualityReading(NamedTuple):
-    temperature: float
-    humidity: float
-    co2: int
-    tvoc: int
-    eco2: int
-    pm10: float
-    pm25: float
-    pm100: float
+    temperature: Optional[float]
+    humidity: Optional[float]
+    co2: Optional[int]
+    tvoc: Optional[int]
+    eco2: Optional[int]
+    pm10: Optional[float]
+    pm25: Optional[float]
+    pm100: Optional[float]
     timestamp: float
+    # Seconds since the SCD41 values were measured
+    climate_age: Optional[float] = None
+
+
+# The SCD41 produces a sample every 5 s in periodic mode; its worker checks
+# in more often but only touches the bus once a sample is due
+SCD41_PERIOD = 5.0
+SCD41_POLL = 0.5
+
+# Silence for longer than this counts as a failed read, so the breaker opens
+# and the sensor's fields go missing instead of being carried forward. The
+# PMS5003 sends a frame every 0.2-2.3 s; the SCD41 is allowed to miss two
+# samples
+SCD41_TIMEOUT = 3 * SCD41_PERIOD
+PMS5003_TIMEOUT = 5.0
 
 
 class DataHistory:
-    def __init__(self, max_history: int = 3600) -> None:
+    def __init__(
+        self,
+        max_history: int = 3600,
+        flush_rows: int = 60,
+        flush_interval: float = 10.0,
+        fsync: bool = True,
+        background: bool = True,
+        queue_size: int = 1024,
+        full_policy: FullPolicy = "drop_oldest",
+        storage_format: StorageFormat = "csv",
+        rollups: Sequence[Tuple[float, int]] = ((60, 7 * 24 * 60), (3600, 90 * 24)),
+        windows: Sequence[float] = (60, 15 * 60, 3600),
+        warm_start: bool = False,
+        segment_interval: Optional[float] = 24 * 60 * 60,
+        segment_bytes: Optional[int] = None,
+    ) -> None:
         self.max_history: int = max_history
-        self.temperature: Deque[float] = deque(maxlen=max_history)
-        self.humidity: Deque[float] = deque(maxlen=max_history)
-        self.co2: Deque[int] = deque(maxlen=max_history)
-        self.tvoc: Deque[int] = deque(maxlen=max_history)
-        self.eco2: Deque[int] = deque(maxlen=max_history)
-        self.pm10: Deque[float] = deque(maxlen=max_history)
-        self.pm25: Deque[float] = deque(maxlen=max_history)
-        self.pm100: Deque[float] = deque(maxlen=max_history)
-        self.timestamps: Deque[float] = deque(maxlen=max_history)
-
-        self.csv_file: str = (
-            f"air_quality_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        )
-        self._init_csv()
-
-    def _init_csv(self) -> None:
-        with open(self.csv_file, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(
-                [
-                    "timestamp",
-                    "temperature",
-                    "humidity",
-                    "co2",
-                    "tvoc",
-                    "eco2",
-                    "pm10",
-                    "pm25",
-                    "pm100",
-                ]
+        self.buffer: RingBuffer = RingBuffer(HISTORY_DTYPE, max_history)
+
+        # Rollup tiers as (resolution in seconds, buckets kept), finest first;
+        # each tier feeds its closed buckets into the next coarser one
+        self.rollups: Dict[float, RollupTier] = {}
+        parent: Optional[RollupTier] = None
+        for resolution, retention in sorted(rollups, reverse=True):
+            parent = RollupTier(resolution, retention, COLUMNS[1:], parent)
+            self.rollups[resolution] = parent
+        self._finest_rollup: Optional[RollupTier] = parent
+
+        self.windows: Dict[float, RollingWindow] = {
+            window: RollingWindow(window, COLUMNS[1:]) for window in windows
+        }
+
+        # A power cut can only tear the tail of the newest file
+        previous = latest_history_file()
+        if previous is not None:
+            removed = recover(previous)
+            intact = os.path.exists(previous)
+            if not intact:
+                print(f"Removed {previous}: no intact data")
+            elif removed:
+                print(f"Recovered {previous}: dropped {removed} bytes of torn data")
+            if (removed or not intact) and os.path.exists(INDEX_PATH):
+                # Keep the segment index in step with what survived
+                index = SegmentIndex(INDEX_PATH)
+                index.refresh(previous)
+                index.save()
+
+        if warm_start:
+            self._preload(tail_previous(storage_format, max_history))
+
+        policy = dict(flush_rows=flush_rows, flush_interval=flush_interval, fsync=fsync)
+        self.sink: BatchedWriter
+        if storage_format != "sqlite" and (segment_interval or segment_bytes):
+            self.sink = SegmentedWriter(
+                storage_format,
+                segment_interval=segment_interval,
+                segment_bytes=segment_bytes,
+                **policy,
             )
+        else:
+            self.sink = WRITERS[storage_format](history_path(storage_format), **policy)
+        # Hand rows to a writer thread so slow storage never stalls sampling
+        self.writer: BatchedWriter | BackgroundWriter = (
+            BackgroundWriter(
+                self.sink,
+                queue_size=queue_size,
+                full_policy=full_policy,
+                flush_interval=flush_interval,
+            )
+            if background
+            else self.sink
+        )
+
+    @property
+    def path(self) -> str:
+        """File currently being written; changes as segments roll over"""
+        return self.sink.path
 
     def add_reading(self, reading: AirQualityReading) -> None:
-        self.temperature.append(reading.temperature)
-        self.humidity.append(reading.humidity)
-        self.co2.append(reading.co2)
-        self.tvoc.append(reading.tvoc)
-        self.eco2.append(reading.eco2)
-        self.pm10.append(reading.pm10)
-        self.pm25.append(reading.pm25)
-        self.pm100.append(reading.pm100)
-        self.timestamps.append(reading.timestamp)
-
-        with open(self.csv_file, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(
-                [
-                    datetime.fromtimestamp(reading.timestamp),
-                    reading.temperature,
-                    reading.humidity,
-                    reading.co2,
-                    reading.tvoc,
-                    reading.eco2,
-                    reading.pm10,
-                    reading.pm25,
-                    reading.pm100,
-                ]
+        row = tuple(
+            np.nan if value is None else value
+            for value in (
+                reading.timestamp,
+                reading.temperature,
+                reading.humidity,
+                reading.co2,
+                reading.tvoc,
+                reading.eco2,
+                reading.pm10,
+                reading.pm25,
+                reading.pm100,
             )
+        )
+        self._remember(row)
+        self.writer.write(row)
+
+    def _remember(self, row: Sequence[float]) -> None:
+        self.buffer.append(row)
+        if self._finest_rollup is not None:
+            self._finest_rollup.add_sample(row[0], row[1:])
+        for window in self.windows.values():
+            window.add(row[0], row[1:])
+
+    def _preload(self, records: np.ndarray) -> None:
+        """Fill the in-memory buffers from stored records without re-writing them"""
+        for record in records.tolist():
+            self._remember(record)
+
+    def view(self, field: str, n: Optional[int] = None) -> np.ndarray:
+        """Newest `n` samples of a field, oldest first, without copying"""
+        return self.buffer.view(field, n)
+
+    def window(
+        self, field: str, start: float, end: Optional[float] = None
+    ) -> np.ndarray:
+        """Samples of a field with timestamps in [start, end], without copying"""
+        return self.buffer.window(field, start, end)
+
+    def rollup(self, resolution: float) -> RollupTier:
+        """Aggregated tier, e.g. rollup(60).window("co2_mean", start)"""
+        return self.rollups[resolution]
+
+    def stats(self, field: str, window: float = 60) -> WindowStats:
+        """Mean/min/max/std/EWMA of a field over one of the configured windows"""
+        return self.windows[window].stats(field)
+
+    def writer_stats(self) -> Optional[WriterStats]:
+        if isinstance(self.writer, BackgroundWriter):
+            return self.writer.stats()
+        return None
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+Runtime = Literal["threads", "asyncio"]
 
 
 class AirQualityMonitor:
-    def __init__(self, update_interval: float = 1.0) -> None:
+    def __init__(
+        self,
+        update_interval: float = 1.0,
+        runtime: Runtime = "threads",
+        skip_missed: bool = True,
+        humidity_deadband: int = 16,
+        humidity_max_age: float = 300.0,
+        history: Optional[DataHistory] = None,
+    ) -> None:
         self.update_interval: float = update_interval
+        self.runtime: Runtime = runtime
+        # Fixed-period sampling keeps rows evenly spaced for the rollups
+        self.scheduler: DeadlineScheduler = DeadlineScheduler(
+            update_interval, skip_missed
+        )
+        # Guards history only; the latest reading is published lock-free
         self.reading_lock: Lock = Lock()
-        self.latest_reading: Optional[AirQualityReading] = None
+        self.latest: LatestValue = LatestValue()
+        # Set whenever a reading is published, so the display can sleep
+        self.new_reading: Event = Event()
         self.running: bool = False
-        self.history: DataHistory = DataHistory()
+        # Storage format, warm start and write policies are set by the caller
+        self.history: DataHistory = history if history is not None else DataHistory()
 
         # Initialize sensors
         self.sgp30: SGP30 = SGP30()
         self.scd41: SCD4X = SCD4X()
-        self.pms5003: PMS5003 = PMS5003()
+        # The driver sets up the enable/reset pins; frames are streamed from
+        # the UART by pms_reader on its own port
+        self.pms5003: PMS5003 = PMS5003(device=PMS5003_DEVICE)
+        self.pms_reader: PMS5003Reader = PMS5003Reader(open_port(PMS5003_DEVICE))
 
         # Initialize display
         oled = sh1106(width=128, height=128, i2c_port=1, rotate=2)
-        self.display = DisplayManager(oled)
+        # Only changed page segments go over I2C
+        self.display = DisplayManager(PartialUpdateDevice(oled))
 
         self.sgp30.start_measurement()
         self.scd41.start_periodic_measurement()
 
+        # One acquisition worker per sensor, each at the device's native rate:
+        # the SGP30 wants a measurement every second, the SCD41 produces one
+        # every 5 s in periodic mode and the PMS5003 frames streamed by
+        # pms_reader are averaged once a second
+        self.sensor_state: SensorState = SensorState()
+        # SGP30 humidity compensation is only resent when the encoded value
+        # (g/m³ in 8.8 fixed point) moves by humidity_deadband or goes stale
+        self.humidity_deadband: int = humidity_deadband
+        self.humidity_max_age: float = humidity_max_age
+        self._climate_seen: float = 0.0
+        self._compensation: Optional[int] = None
+        self._compensated_at: float = 0.0
+        self.workers: List[SensorWorker] = [
+            SensorWorker("sgp30", self._read_sgp30, 1.0, self.sensor_state),
+            SensorWorker(
+                "scd41",
+                self._read_scd41,
+                SCD41_POLL,
+                self.sensor_state,
+                max_age=SCD41_TIMEOUT,
+            ),
+            SensorWorker(
+                "pms5003",
+                self._read_pms5003,
+                1.0,
+                self.sensor_state,
+                max_age=PMS5003_TIMEOUT,
+            ),
+        ]
+        self.async_sinks: List[AsyncSinkCallback] = []
+
+    @property
+    def latest_reading(self) -> Optional[AirQualityReading]:
+        return self.latest.value
+
+    def sensor_health(self) -> Dict[str, BreakerStats]:
+        """Breaker state and failure/recovery counters for each sensor"""
+        return {worker.name: worker.breaker.stats() for worker in self.workers}
+
+    def add_async_sink(self, sink: AsyncSinkCallback) -> None:
+        """Register a coroutine called with every reading in the asyncio runtime"""
+        self.async_sinks.append(sink)
+
     def start(self) -> None:
         self.running = True
+        self.pms_reader.start()
+        if self.runtime == "asyncio":
+            self._loop = asyncio.new_event_loop()
+            self._stop_event = asyncio.Event()
+            self.async_thread = Thread(
+                target=self._loop.run_until_complete,
+                args=(self._run_async(),),
+                daemon=True,
+            )
+            self.async_thread.start()
+            return
+
+        for worker in self.workers:
+            worker.start()
         self.monitor_thread = Thread(target=self._monitoring_loop, daemon=True)
         self.display_thread = Thread(target=self._display_loop, daemon=True)
         self.monitor_thread.start()
@@ -117,97 +321,228 @@ class AirQualityMonitor:
 
     def stop(self) -> None:
         self.running = False
-        self.monitor_thread.join()
-        self.display_thread.join()
+        if self.runtime == "asyncio":
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+            self.async_thread.join()
+            self._loop.close()
+        else:
+            self.monitor_thread.join()
+            self.new_reading.set()  # Wake the display loop so it sees running
+            self.display_thread.join()
+            for worker in self.workers:
+                worker.stop()
+        self.pms_reader.stop()
         self.scd41.stop_periodic_measurement()
+        with self.reading_lock:
+            self.history.close()
 
     def _calculate_absolute_humidity(
         self, temperature: float, relative_humidity: float
     ) -> int:
         temp_k = temperature + 273.15
-        pvs = 6.112 * np.exp((17.62 * temperature) / (243.12 + temperature))
+        pvs = 6.112 * math.exp((17.62 * temperature) / (243.12 + temperature))
         abs_humidity = (relative_humidity * pvs * 2.1674) / temp_k
         return int(abs_humidity * 256)
 
     def _display_loop(self) -> None:
         while self.running:
             try:
-                with self.reading_lock:
-                    reading = self.latest_reading
+                # Redraw only for a new reading or a page rotation
+                self.new_reading.wait(self.display.next_page_in())
+                self.new_reading.clear()
 
+                reading = self.latest_reading
                 if reading:
                     self.display.update(reading)
 
-                time.sleep(0.1)
-
             except Exception as e:
                 print(f"Display error: {e}")
                 time.sleep(1)
 
+    def _read_sgp30(self) -> Dict[str, Any]:
+        # Compensate on this thread so SGP30 commands never interleave
+        climate = self.sensor_state.get("scd41")
+        if climate is not None and climate.timestamp != self._climate_seen:
+            self._climate_seen = climate.timestamp
+            abs_humidity = self._calculate_absolute_humidity(
+                climate.values["temperature"], climate.values["humidity"]
+            )
+            now = time.time()
+            if (
+                self._compensation is None
+                or abs(abs_humidity - self._compensation) >= self.humidity_deadband
+                or now - self._compensated_at >= self.humidity_max_age
+            ):
+                self.sgp30.command("set_humidity", [abs_humidity])
+                self._compensation = abs_humidity
+                self._compensated_at = now
+
+        air_quality = self.sgp30.get_air_quality()
+        return {"tvoc": air_quality.total_voc, "eco2": air_quality.equivalent_co2}
+
+    def _read_scd41(self) -> Optional[Dict[str, Any]]:
+        last = self.sensor_state.get("scd41")
+        if (
+            last is not None
+            and time.time() - last.timestamp < SCD41_PERIOD - SCD41_POLL
+        ):
+            return None
+
+        # Reads the data-ready status and only fetches a measurement if set
+        results = self.scd41.measure(blocking=False)
+        if results is None:
+            return None
+
+        co2, temp, humidity, _ = results
+        return {"co2": co2, "temperature": temp, "humidity": humidity}
+
+    def _read_pms5003(self) -> Optional[Dict[str, Any]]:
+        # Never waits on the UART; None keeps the previous values until a
+        # new frame arrives
+        return self.pms_reader.average()
+
+    def _publish_merged(self) -> Optional[AirQualityReading]:
+        """Merge the latest values from every available sensor into a reading.
+
+        Fields from sensors that have not reported or whose breaker is open
+        are left as None, so one failing device never blocks the others.
+        """
+        values: Dict[str, Any] = dict.fromkeys(COLUMNS[1:])
+        samples = self.sensor_state.snapshot()
+        reported = False
+        for worker in self.workers:
+            sample = samples.get(worker.name)
+            if sample is not None and worker.available:
+                values.update(sample.values)
+                reported = True
+        if not reported:
+            return None
+
+        # Climate values are carried forward between SCD41 samples
+        now = time.time()
+        climate = samples.get("scd41")
+        climate_age = None
+        if climate is not None and values["co2"] is not None:
+            climate_age = now - climate.timestamp
+        reading = AirQualityReading(timestamp=now, climate_age=climate_age, **values)
+        self.latest.publish(reading)
+        with self.reading_lock:
+            self.history.add_reading(reading)
+        self.new_reading.set()
+        return reading
+
     def _monitoring_loop(self) -> None:
+        self.scheduler.reset()
         while self.running:
             try:
-                air_quality = self.sgp30.get_air_quality()
-                results = self.scd41.measure()
-                pms_data = self.pms5003.read()
+                self._publish_merged()
+            except Exception as e:
+                print(f"Monitoring error: {e}")
+            self.scheduler.wait()
+
+    async def _run_async(self) -> None:
+        stop = self._stop_event
+        new_reading = asyncio.Event()
+        # Blocking device I/O shares one small pool instead of a thread each
+        executor = ThreadPoolExecutor(max_workers=len(self.workers) + 1)
+        sinks = [AsyncSink(callback) for callback in self.async_sinks]
+
+        tasks = [
+            asyncio.create_task(poll_sensor_async(worker, stop, executor))
+            for worker in self.workers
+        ]
+        tasks += [asyncio.create_task(sink.run()) for sink in sinks]
+        tasks.append(asyncio.create_task(self._display_async(new_reading, executor)))
+
+        self.scheduler.reset()
+        while not stop.is_set():
+            try:
+                reading = self._publish_merged()
+                if reading is not None:
+                    new_reading.set()
+                    for sink in sinks:
+                        sink.put(reading)
+            except Exception as e:
+                print(f"Monitoring error: {e}")
 
-                if results is None:
-                    raise ValueError("No results from SCD41")
+            await wait_or_stop(stop, self.scheduler.next_delay())
+            self.scheduler.tick()
 
-                co2, temp, humidity, timestamp = results
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        executor.shutdown(wait=True)
 
-                abs_humidity = self._calculate_absolute_humidity(temp, humidity)
-                self.sgp30.command("set_humidity", [abs_humidity])
+    async def _display_async(
+        self, new_reading: asyncio.Event, executor: ThreadPoolExecutor
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Wake for a new reading or the next page rotation, whichever is first
+                try:
+                    await asyncio.wait_for(
+                        new_reading.wait(), self.display.next_page_in()
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                new_reading.clear()
+
+                reading = self.latest_reading
+                if reading:
+                    await loop.run_in_executor(executor, self.display.update, reading)
 
-                reading = AirQualityReading(
-                    temperature=temp,
-                    humidity=humidity,
-                    co2=co2,
-                    tvoc=air_quality.total_voc,
-                    eco2=air_quality.equivalent_co2,
-                    pm10=pms_data.pm_ug_per_m3(1.0),
-                    pm25=pms_data.pm_ug_per_m3(2.5),
-                    pm100=pms_data.pm_ug_per_m3(10),
-                    timestamp=timestamp,
-                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Display error: {e}")
+                await asyncio.sleep(1)
 
-                with self.reading_lock:
-                    self.latest_reading = reading
-                    self.history.add_reading(reading)
 
-                time.sleep(self.update_interval)
+def _format(value: Optional[float], spec: str = "") -> str:
+    """Format a reading field, showing missing values as --"""
+    return "--" if value is None else format(value, spec)
 
-            except Exception as e:
-                print(f"Monitoring error: {e}")
-                time.sleep(1)
 
+def main(
+    update_interval: float = 1.0, runtime: Runtime = "threads", **history_options: Any
+) -> None:
+    """Run the monitor with a text dashboard.
 
-if __name__ == "__main__":
-    monitor = AirQualityMonitor()
+    Any other option is passed to DataHistory, e.g. --storage_format=gorilla
+    --warm_start --full_policy=block --flush_rows=120.
+    """
+    monitor = AirQualityMonitor(
+        update_interval, runtime, history=DataHistory(**history_options)
+    )
     monitor.start()
 
     try:
+        shown = 0
         while True:
-            with monitor.reading_lock:
-                reading = monitor.latest_reading
+            seq, reading = monitor.latest.get()
 
-            if reading:
+            if reading and seq != shown:
+                shown = seq
                 print("\033[2J\033[H")  # Clear terminal
                 print(
                     f"Air Quality Monitor - {datetime.fromtimestamp(reading.timestamp)}"
                 )
                 print("-" * 50)
-                print(f"Temperature: {reading.temperature:.1f}°C")
-                print(f"Humidity: {reading.humidity:.1f}%")
-                print(f"CO2: {reading.co2} ppm")
-                print(f"TVOC: {reading.tvoc} ppb")
-                print(f"eCO2: {reading.eco2} ppm")
-                print(f"PM1.0: {reading.pm10} µg/m³")
-                print(f"PM2.5: {reading.pm25} µg/m³")
-                print(f"PM10: {reading.pm100} µg/m³")
+                print(f"Temperature: {_format(reading.temperature, '.1f')}°C")
+                print(f"Humidity: {_format(reading.humidity, '.1f')}%")
+                print(f"CO2: {_format(reading.co2)} ppm")
+                print(f"TVOC: {_format(reading.tvoc)} ppb")
+                print(f"eCO2: {_format(reading.eco2)} ppm")
+                print(f"PM1.0: {_format(reading.pm10)} µg/m³")
+                print(f"PM2.5: {_format(reading.pm25)} µg/m³")
+                print(f"PM10: {_format(reading.pm100)} µg/m³")
 
             time.sleep(1)
     except KeyboardInterrupt:
         print("\nStopping monitor...")
         monitor.stop()
 
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,136 @@
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+from collections import deque
+from threading import Event, Lock, Thread
+import struct
+import time
+
+PMS5003_DEVICE = "/dev/ttyAMA0"
+PMS5003_BAUDRATE = 9600
+
+FRAME_START = b"\x42\x4d"
+FRAME_LENGTH = 28  # Payload bytes after the length field, checksum included
+FRAME_SIZE = 4 + FRAME_LENGTH
+# Thirteen big-endian data words followed by the checksum
+_FRAME_DATA = struct.Struct(">13HH")
+
+# Fields taken from each frame: index of the standard particle
+# concentration (µg/m³) in the frame's data words
+PM_FIELDS = {"pm10": 0, "pm25": 1, "pm100": 2}
+
+
+class PMSFrame(NamedTuple):
+    seq: int
+    timestamp: float
+    data: Tuple[int, ...]
+
+
+def open_port(device: str = PMS5003_DEVICE, baudrate: int = PMS5003_BAUDRATE) -> Any:
+    """Open the PMS5003's UART with pyserial for a PMS5003Reader"""
+    import serial
+
+    return serial.Serial(device, baudrate=baudrate, timeout=4)
+
+
+class PMS5003Reader:
+    """Streams PMS5003 frames off the UART on a background thread.
+
+    `port` is any serial-like object with read() and in_waiting, such as
+    the pyserial port from open_port(). Bytes are parsed as they arrive
+    into a small ring of validated frames, resynchronising on the 0x42 0x4d
+    header after noise or a checksum failure. Callers never wait on the
+    serial port: latest() returns the newest frame and average() every
+    frame since the previous call.
+    """
+
+    def __init__(self, port: Any, buffer_size: int = 32) -> None:
+        self.port: Any = port
+        self.frames: int = 0
+        self.checksum_errors: int = 0
+        self.discarded_bytes: int = 0
+        self._buffer: bytearray = bytearray()
+        self._ring: Deque[PMSFrame] = deque(maxlen=buffer_size)
+        self._taken: int = 0
+        self._lock: Lock = Lock()
+        self._stop: Event = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="pms5003-reader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def latest(self) -> Optional[PMSFrame]:
+        with self._lock:
+            return self._ring[-1] if self._ring else None
+
+    def since(self, seq: int) -> List[PMSFrame]:
+        """Buffered frames newer than `seq`"""
+        with self._lock:
+            return [frame for frame in self._ring if frame.seq > seq]
+
+    def average(self) -> Optional[Dict[str, float]]:
+        """Mean of each PM field over the frames received since the last call"""
+        frames = self.since(self._taken)
+        if not frames:
+            return None
+        self._taken = frames[-1].seq
+        return {
+            name: sum(frame.data[index] for frame in frames) / len(frames)
+            for name, index in PM_FIELDS.items()
+        }
+
+    def feed(self, chunk: bytes) -> None:
+        """Parse raw serial bytes, keeping any partial frame for the next call"""
+        buffer = self._buffer
+        buffer += chunk
+        while True:
+            start = buffer.find(FRAME_START)
+            if start < 0:
+                # Keep a trailing 0x42 that may begin the next header
+                keep = 1 if buffer.endswith(FRAME_START[:1]) else 0
+                self.discarded_bytes += len(buffer) - keep
+                del buffer[: len(buffer) - keep]
+                return
+            if start:
+                self.discarded_bytes += start
+                del buffer[:start]
+            if len(buffer) < 4:
+                return
+
+            (length,) = struct.unpack_from(">H", buffer, 2)
+            if length != FRAME_LENGTH:
+                # Not a real header; skip it and look for the next one
+                self.discarded_bytes += 2
+                del buffer[:2]
+                continue
+            if len(buffer) < FRAME_SIZE:
+                return
+
+            *data, checksum = _FRAME_DATA.unpack_from(buffer, 4)
+            if sum(buffer[: FRAME_SIZE - 2]) != checksum:
+                self.checksum_errors += 1
+                self.discarded_bytes += 2
+                del buffer[:2]
+                continue
+
+            del buffer[:FRAME_SIZE]
+            with self._lock:
+                self.frames += 1
+                self._ring.append(PMSFrame(self.frames, time.time(), tuple(data)))
+
+    def _run(self) -> None:
+        port = self.port
+        while not self._stop.is_set():
+            try:
+                # Block for at least one byte (bounded by the port timeout),
+                # then drain whatever else is already waiting
+                self.feed(port.read(max(1, port.in_waiting)))
+
+            except Exception as e:
+                print(f"PMS5003 reader error: {e}")
+                self._stop.wait(1)
@@ -0,0 +1,88 @@
+from typing import Deque, NamedTuple, Optional
+from collections import deque
+from threading import Event
+import time
+
+
+class SchedulerStats(NamedTuple):
+    ticks: int
+    overruns: int
+    skipped: int
+    rate: float  # Achieved ticks per second over the recent window
+    mean_jitter: float  # Seconds late relative to the deadline
+    max_jitter: float
+
+
+class DeadlineScheduler:
+    """Fixed-period ticks on absolute time.monotonic() deadlines.
+
+    Each deadline is the previous deadline plus `period`, not "now plus
+    period", so time spent doing work never accumulates as drift. When the
+    work overruns a deadline it is counted; with `skip_missed` the schedule
+    jumps to the next deadline still in the future, otherwise the missed
+    ticks run back to back until the schedule catches up.
+    """
+
+    def __init__(
+        self, period: float, skip_missed: bool = True, window: int = 60
+    ) -> None:
+        self.period: float = period
+        self.skip_missed: bool = skip_missed
+        self.ticks: int = 0
+        self.overruns: int = 0
+        self.skipped: int = 0
+        self._deadline: Optional[float] = None
+        self._jitter: Deque[float] = deque(maxlen=window)
+        self._times: Deque[float] = deque(maxlen=window)
+
+    def reset(self) -> None:
+        """Start the schedule from now"""
+        self._deadline = time.monotonic()
+
+    def next_delay(self) -> float:
+        """Advance to the next deadline and return the seconds until it"""
+        now = time.monotonic()
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline += self.period
+
+        if now > self._deadline:
+            self.overruns += 1
+            if self.skip_missed:
+                missed = int((now - self._deadline) // self.period) + 1
+                self._deadline += missed * self.period
+                self.skipped += missed
+
+        return max(self._deadline - now, 0.0)
+
+    def tick(self) -> None:
+        """Record that the tick for the current deadline has started"""
+        now = time.monotonic()
+        if self._deadline is not None:
+            self._jitter.append(max(now - self._deadline, 0.0))
+        self._times.append(now)
+        self.ticks += 1
+
+    def wait(self, stop: Optional[Event] = None) -> bool:
+        """Sleep until the next deadline; False if `stop` was set meanwhile"""
+        delay = self.next_delay()
+        if stop is not None:
+            if stop.wait(delay):
+                return False
+        elif delay > 0:
+            time.sleep(delay)
+        self.tick()
+        return True
+
+    def stats(self) -> SchedulerStats:
+        times = self._times
+        elapsed = times[-1] - times[0] if len(times) > 1 else 0.0
+        jitter = self._jitter
+        return SchedulerStats(
+            ticks=self.ticks,
+            overruns=self.overruns,
+            skipped=self.skipped,
+            rate=(len(times) - 1) / elapsed if elapsed > 0 else 0.0,
+            mean_jitter=sum(jitter) / len(jitter) if jitter else 0.0,
+            max_jitter=max(jitter, default=0.0),
+        )
@@ -0,0 +1,942 @@
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from datetime import datetime
+from threading import Thread, Lock
+from contextlib import closing
+import sqlite3
+import queue
+import time
+import math
+import numpy as np
+import struct
+import json
+import glob
+import csv
+import zlib
+import io
+import os
+
+from gorilla import GorillaEncoder, decode_block
+
+COLUMNS = [
+    "timestamp",
+    "temperature",
+    "humidity",
+    "co2",
+    "tvoc",
+    "eco2",
+    "pm10",
+    "pm25",
+    "pm100",
+]
+
+# Packed 40-byte record; float32 represents every sensor count exactly
+HISTORY_DTYPE = np.dtype(
+    [
+        ("timestamp", "<f8"),
+        ("temperature", "<f4"),
+        ("humidity", "<f4"),
+        ("co2", "<f4"),
+        ("tvoc", "<f4"),
+        ("eco2", "<f4"),
+        ("pm10", "<f4"),
+        ("pm25", "<f4"),
+        ("pm100", "<f4"),
+    ]
+)
+
+
+class BatchedWriter:
+    """Long-lived writer that batches rows and flushes on a row/time policy.
+
+    Rows are sequences in COLUMNS order with the timestamp as epoch seconds.
+    Pending rows are written out once `flush_rows` have accumulated or
+    `flush_interval` seconds have passed since the last flush, whichever
+    comes first. Subclasses persist each batch in `_write_rows`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_rows: int = 60,
+        flush_interval: float = 10.0,
+        fsync: bool = True,
+    ) -> None:
+        self.path: str = path
+        self.flush_rows: int = flush_rows
+        self.flush_interval: float = flush_interval
+        self.fsync: bool = fsync
+        self._pending: List[Sequence[Any]] = []
+        self._last_flush: float = time.monotonic()
+
+    def write(self, row: Sequence[Any]) -> None:
+        self._pending.append(row)
+        if self._flush_due(len(self._pending)):
+            self.flush()
+
+    def _flush_due(self, pending: int) -> bool:
+        return (
+            pending >= self.flush_rows
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        )
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+
+        self._write_rows(self._pending)
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+    def _write_rows(self, rows: List[Sequence[Any]]) -> None:
+        raise NotImplementedError
+
+
+CHECKSUM_SUFFIX = ".crc"
+# One entry per appended block: end offset of the block and its CRC32
+_CHECKSUM = struct.Struct("<QI")
+
+
+class ChecksummedWriter(BatchedWriter):
+    """Append-only file writer with a per-block checksum sidecar.
+
+    Each flush appends one block of encoded rows to the file and then
+    records the block's end offset and CRC32 in `<path>.crc`. The entry is
+    only written once the block itself is on disk (when `fsync` is on), so
+    recover() can cut a torn tail back to the last intact block.
+    """
+
+    def __init__(self, path: str, header: bytes, **kwargs: Any) -> None:
+        super().__init__(path, **kwargs)
+        self._file: IO[bytes] = open(path, "wb")
+        self._checksums: IO[bytes] = open(path + CHECKSUM_SUFFIX, "wb")
+        self._append(header)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        self._checksums.close()
+
+    def _write_rows(self, rows: List[Sequence[Any]]) -> None:
+        self._append(self._encode_rows(rows))
+
+    def _encode_rows(self, rows: List[Sequence[Any]]) -> bytes:
+        raise NotImplementedError
+
+    def _append(self, block: bytes) -> None:
+        self._file.write(block)
+        self._sync(self._file)
+        entry = _CHECKSUM.pack(self._file.tell(), zlib.crc32(block))
+        self._checksums.write(entry)
+        self._sync(self._checksums)
+
+    def _sync(self, f: IO[bytes]) -> None:
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+
+def recover(path: str) -> int:
+    """Truncate a file to its last block with a valid checksum.
+
+    Walks the checksum sidecar backwards from its end, so the work is
+    proportional to the damaged tail rather than the file. If not even the
+    header block validates, the file and its sidecar are deleted rather
+    than left empty and unreadable. Returns the number of bytes removed
+    from the data file.
+    """
+    checksums_path = path + CHECKSUM_SUFFIX
+    if not os.path.exists(checksums_path):
+        return 0
+
+    with open(path, "r+b") as data, open(checksums_path, "r+b") as checksums:
+        size = data.seek(0, os.SEEK_END)
+        count = checksums.seek(0, os.SEEK_END) // _CHECKSUM.size
+        valid_end = 0
+        while count > 0:
+            checksums.seek((count - 2) * _CHECKSUM.size if count > 1 else 0)
+            entries = checksums.read(_CHECKSUM.size * min(count, 2))
+            start = _CHECKSUM.unpack_from(entries)[0] if count > 1 else 0
+            end, crc = _CHECKSUM.unpack_from(entries, len(entries) - _CHECKSUM.size)
+            if end <= size:
+                data.seek(start)
+                if zlib.crc32(data.read(end - start)) == crc:
+                    valid_end = end
+                    break
+            count -= 1
+
+        checksums.truncate(count * _CHECKSUM.size)
+        if size > valid_end:
+            data.truncate(valid_end)
+
+    if valid_end == 0:
+        os.remove(path)
+        os.remove(checksums_path)
+    return size - valid_end
+
+
+def _csv_bytes(rows: Iterable[Sequence[Any]]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+class CsvWriter(ChecksummedWriter):
+    def __init__(self, path: str, **kwargs: Any) -> None:
+        super().__init__(path, _csv_bytes([COLUMNS]), **kwargs)
+
+    def _encode_rows(self, rows: List[Sequence[Any]]) -> bytes:
+        return _csv_bytes([datetime.fromtimestamp(row[0]), *row[1:]] for row in rows)
+
+
+# Binary history files are a fixed-size header followed by packed
+# HISTORY_DTYPE records, so any record can be located by offset alone.
+BINARY_MAGIC = b"AQHIST\0\0"
+BINARY_VERSION = 1
+BINARY_HEADER_SIZE = 256
+_BINARY_HEADER = struct.Struct("<8sHHI")
+
+
+def _binary_header(dtype: np.dtype) -> bytes:
+    schema = json.dumps(dtype.descr).encode()
+    header = _BINARY_HEADER.pack(
+        BINARY_MAGIC, BINARY_VERSION, dtype.itemsize, len(schema)
+    )
+    header += schema
+    if len(header) > BINARY_HEADER_SIZE:
+        raise ValueError("Schema does not fit in the binary header")
+    return header.ljust(BINARY_HEADER_SIZE, b"\0")
+
+
+def _read_binary_header(f: IO[bytes]) -> np.dtype:
+    raw = f.read(BINARY_HEADER_SIZE)
+    if len(raw) < BINARY_HEADER_SIZE:
+        raise ValueError("Truncated binary history header")
+
+    magic, version, record_size, schema_len = _BINARY_HEADER.unpack_from(raw)
+    if magic != BINARY_MAGIC:
+        raise ValueError("Not a binary history file")
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary history version: {version}")
+
+    offset = _BINARY_HEADER.size
+    descr = json.loads(raw[offset : offset + schema_len])
+    dtype = np.dtype([tuple(field) for field in descr])
+    if dtype.itemsize != record_size:
+        raise ValueError("Binary history header is inconsistent")
+    return dtype
+
+
+class BinaryWriter(ChecksummedWriter):
+    """Appends fixed-width HISTORY_DTYPE records behind a schema header"""
+
+    def __init__(self, path: str, **kwargs: Any) -> None:
+        super().__init__(path, _binary_header(HISTORY_DTYPE), **kwargs)
+
+    def _encode_rows(self, rows: List[Sequence[Any]]) -> bytes:
+        return np.array(rows, dtype=HISTORY_DTYPE).tobytes()
+
+
+class BinaryHistory:
+    """Lazy random-access reader for binary history files.
+
+    Records are exposed through `np.memmap`, so only the pages that are
+    actually indexed are read from disk. Call `refresh()` to pick up records
+    appended since the file was opened.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        with open(path, "rb") as f:
+            self.dtype: np.dtype = _read_binary_header(f)
+        self.records: np.ndarray = np.empty(0, dtype=self.dtype)
+        self.refresh()
+
+    def refresh(self) -> None:
+        size = os.path.getsize(self.path) - BINARY_HEADER_SIZE
+        count = max(0, size // self.dtype.itemsize)
+        if count == len(self.records):
+            return
+        self.records = np.memmap(
+            self.path,
+            dtype=self.dtype,
+            mode="r",
+            offset=BINARY_HEADER_SIZE,
+            shape=(count,),
+        )
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index: Any) -> Any:
+        return self.records[index]
+
+    def window(self, start: float, end: Optional[float] = None) -> np.ndarray:
+        """Records with timestamps in [start, end]"""
+        timestamps = self.records["timestamp"]
+        lo = int(np.searchsorted(timestamps, start, side="left"))
+        hi = (
+            len(timestamps)
+            if end is None
+            else int(np.searchsorted(timestamps, end, side="right"))
+        )
+        return self.records[lo:hi]
+
+
+def binary_to_csv(binary_path: str, csv_path: str, chunk_rows: int = 65536) -> None:
+    """Convert a binary history file to the CSV layout evaluate.py reads"""
+    history = BinaryHistory(binary_path)
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for start in range(0, len(history), chunk_rows):
+            chunk = history[start : start + chunk_rows]
+            columns = [
+                [datetime.fromtimestamp(ts) for ts in chunk["timestamp"].tolist()]
+            ]
+            # %.7g prints float32 values at their real precision
+            columns += [np.char.mod("%.7g", chunk[name]) for name in COLUMNS[1:]]
+            writer.writerows(zip(*columns))
+
+
+# Gorilla archives are a file header followed by independently decodable
+# blocks, one per flush, each prefixed with its row count and byte length.
+GORILLA_MAGIC = b"AQGORILA"
+GORILLA_VERSION = 1
+_GORILLA_HEADER = struct.Struct("<8sHH")
+_GORILLA_BLOCK = struct.Struct("<II")
+
+
+class GorillaWriter(ChecksummedWriter):
+    """Compressed archive writer using delta-of-delta timestamps and XOR floats.
+
+    Rows are fed straight into a streaming GorillaEncoder rather than kept
+    as pending rows; each flush closes the current block and appends it.
+    Larger `flush_rows` give longer blocks and better compression.
+    """
+
+    def __init__(self, path: str, **kwargs: Any) -> None:
+        header = _GORILLA_HEADER.pack(GORILLA_MAGIC, GORILLA_VERSION, len(COLUMNS) - 1)
+        super().__init__(path, header, **kwargs)
+        self._encoder: GorillaEncoder = GorillaEncoder(len(COLUMNS) - 1)
+
+    def write(self, row: Sequence[Any]) -> None:
+        self._encoder.add(row[0], row[1:])
+        if self._flush_due(self._encoder.rows):
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        rows = self._encoder.rows
+        if not rows:
+            return
+
+        data = self._encoder.finish()
+        self._append(_GORILLA_BLOCK.pack(rows, len(data)) + data)
+
+
+def _gorilla_blocks(path: str) -> Iterator[Tuple[int, int, int]]:
+    """Yield (offset, rows, length) for each complete block without decoding"""
+    with open(path, "rb") as f:
+        magic, version, columns = _GORILLA_HEADER.unpack(f.read(_GORILLA_HEADER.size))
+        if magic != GORILLA_MAGIC:
+            raise ValueError("Not a Gorilla history archive")
+        if version != GORILLA_VERSION or columns != len(COLUMNS) - 1:
+            raise ValueError(f"Unsupported Gorilla archive version: {version}")
+
+        size = os.fstat(f.fileno()).st_size
+        offset = _GORILLA_HEADER.size
+        while offset + _GORILLA_BLOCK.size <= size:
+            f.seek(offset)
+            rows, length = _GORILLA_BLOCK.unpack(f.read(_GORILLA_BLOCK.size))
+            offset += _GORILLA_BLOCK.size
+            if offset + length > size:
+                return
+            yield offset, rows, length
+            offset += length
+
+
+def read_gorilla(path: str, skip_rows: int = 0) -> np.ndarray:
+    """Decode a Gorilla archive, skipping whole blocks before `skip_rows`"""
+    blocks = list(_gorilla_blocks(path))
+    records = []
+    seen = 0
+    with open(path, "rb") as f:
+        for offset, rows, length in blocks:
+            seen += rows
+            if seen <= skip_rows:
+                continue
+            f.seek(offset)
+            block = f.read(length)
+            records.extend(
+                (timestamp, *values)
+                for timestamp, values in decode_block(block, rows, len(COLUMNS) - 1)
+            )
+
+    first = max(0, skip_rows - (seen - len(records)))
+    return np.array(records[first:], dtype=HISTORY_DTYPE)
+
+
+def gorilla_rows(path: str) -> int:
+    return sum(rows for _, rows, _ in _gorilla_blocks(path))
+
+
+SQLITE_PATH = "air_quality.db"
+_SQLITE_TYPES = {"co2": "INTEGER", "tvoc": "INTEGER", "eco2": "INTEGER"}
+
+
+class SQLiteWriter(BatchedWriter):
+    """Writes every reading into one SQLite database.
+
+    The database runs in WAL mode so readers never block the writer, rows
+    are keyed and indexed by timestamp, and each flush inserts its batch
+    with one executemany inside a single transaction.
+    """
+
+    def __init__(self, path: str, **kwargs: Any) -> None:
+        super().__init__(path, **kwargs)
+        # The connection is used from the BackgroundWriter thread
+        self._conn: Optional[sqlite3.Connection] = sqlite3.connect(
+            path, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+        columns = ", ".join(
+            f"{name} {_SQLITE_TYPES.get(name, 'REAL')}" for name in COLUMNS[1:]
+        )
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS readings "
+                f"(timestamp REAL PRIMARY KEY, {columns}) WITHOUT ROWID"
+            )
+        self._insert: str = (
+            f"INSERT OR REPLACE INTO readings ({', '.join(COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(COLUMNS))})"
+        )
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None
+
+    def _write_rows(self, rows: List[Sequence[Any]]) -> None:
+        assert self._conn is not None
+        with self._conn:
+            self._conn.executemany(self._insert, rows)
+
+
+def read_sqlite(
+    path: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    limit: Optional[int] = None,
+) -> np.ndarray:
+    """Records with timestamps in [start, end] using the timestamp index.
+
+    With `limit`, only the newest `limit` matching records are returned.
+    The database is opened read-only, so this is safe alongside a running
+    writer.
+    """
+    query = f"SELECT {', '.join(COLUMNS)} FROM readings WHERE timestamp >= ?"
+    params: List[Any] = [-np.inf if start is None else start]
+    if end is not None:
+        query += " AND timestamp <= ?"
+        params.append(end)
+    if limit is not None:
+        query += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(limit)
+
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+        rows = conn.execute(query, params).fetchall()
+    if limit is not None:
+        rows.reverse()
+    return np.array(
+        [tuple(np.nan if value is None else value for value in row) for row in rows],
+        dtype=HISTORY_DTYPE,
+    )
+
+
+WRITERS = {
+    "csv": CsvWriter,
+    "binary": BinaryWriter,
+    "gorilla": GorillaWriter,
+    "sqlite": SQLiteWriter,
+}
+EXTENSIONS = {"csv": ".csv", "binary": ".aqh", "gorilla": ".aqz", "sqlite": ".db"}
+StorageFormat = Literal["csv", "binary", "gorilla", "sqlite"]
+
+
+def history_path(
+    storage_format: StorageFormat, timestamp: Optional[float] = None
+) -> str:
+    """File a new DataHistory writes to; SQLite keeps one database for all runs"""
+    if storage_format == "sqlite":
+        return SQLITE_PATH
+
+    started = datetime.now() if timestamp is None else datetime.fromtimestamp(timestamp)
+    stem = f"air_quality_{started.strftime('%Y%m%d_%H%M%S')}"
+    path = f"{stem}{EXTENSIONS[storage_format]}"
+    suffix = 0
+    while os.path.exists(path):
+        suffix += 1
+        path = f"{stem}_{suffix}{EXTENSIONS[storage_format]}"
+    return path
+
+
+def latest_history_file(directory: str = ".") -> Optional[str]:
+    """Most recent air_quality_* file in any storage format, by name"""
+    candidates = [
+        path
+        for extension in EXTENSIONS.values()
+        for path in glob.glob(os.path.join(directory, f"air_quality_*{extension}"))
+    ]
+    # Names embed the start time, so they sort chronologically
+    return max(candidates, key=os.path.basename, default=None)
+
+
+def tail_csv(path: str, n: int, block_size: int = 65536) -> np.ndarray:
+    """Parse the last `n` rows of a history CSV by reading backwards from EOF.
+
+    Only the tail blocks are read, so the cost is bounded by `n` rather than
+    the file size. Rows that fail to parse, such as a half-written last line
+    after a power cut, are skipped.
+    """
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        while position > 0 and data.count(b"\n") <= n + 1:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+
+    lines = data.decode(errors="replace").splitlines()
+    if position > 0:
+        lines = lines[1:]  # First line is cut off mid-row
+    return _parse_csv(lines[-(n + 1) :])[-n:]
+
+
+def read_csv(path: str) -> np.ndarray:
+    with open(path, newline="") as f:
+        return _parse_csv(f)
+
+
+def _parse_csv(lines: Iterable[str]) -> np.ndarray:
+    """Parse history CSV lines, skipping the header and malformed rows"""
+    rows = []
+    for fields in csv.reader(lines):
+        try:
+            if len(fields) != len(COLUMNS):
+                raise ValueError(f"Expected {len(COLUMNS)} fields")
+            timestamp = datetime.fromisoformat(fields[0]).timestamp()
+            values = [float(value) if value else np.nan for value in fields[1:]]
+        except ValueError:
+            continue
+        rows.append((timestamp, *values))
+    return np.array(rows, dtype=HISTORY_DTYPE)
+
+
+def tail_history(path: str, n: int) -> np.ndarray:
+    """Last `n` records of a history file in any storage format.
+
+    Files that cannot be parsed are reported and yield no records, so a
+    damaged file never stops a warm start.
+    """
+    try:
+        if path.endswith(EXTENSIONS["binary"]):
+            return np.array(BinaryHistory(path)[-n:])
+        if path.endswith(EXTENSIONS["sqlite"]):
+            return read_sqlite(path, limit=n)
+        if path.endswith(EXTENSIONS["gorilla"]):
+            return read_gorilla(path, skip_rows=gorilla_rows(path) - n)
+        return tail_csv(path, n)
+    except (OSError, ValueError, struct.error, sqlite3.Error) as e:
+        print(f"Skipping unreadable history {path}: {e}")
+        return np.empty(0, dtype=HISTORY_DTYPE)
+
+
+def read_history(
+    path: str, start: Optional[float] = None, end: Optional[float] = None
+) -> np.ndarray:
+    """Records of a history file in any storage format within [start, end]"""
+    if path.endswith(EXTENSIONS["sqlite"]):
+        return read_sqlite(path, start, end)
+    if path.endswith(EXTENSIONS["binary"]):
+        history = BinaryHistory(path)
+        return np.array(history.window(-np.inf if start is None else start, end))
+
+    records = (
+        read_gorilla(path) if path.endswith(EXTENSIONS["gorilla"]) else read_csv(path)
+    )
+    timestamps = records["timestamp"]
+    mask = np.ones(len(records), dtype=bool)
+    if start is not None:
+        mask &= timestamps >= start
+    if end is not None:
+        mask &= timestamps <= end
+    return records[mask]
+
+
+INDEX_PATH = "air_quality_index.json"
+
+
+class SegmentIndex:
+    """Small JSON index of history segments and the time span each one covers.
+
+    Each entry records a segment's file name (relative to the index), its
+    first and last timestamps and its row count, so range queries only open
+    the segments that overlap the requested range.
+    """
+
+    def __init__(self, path: str = INDEX_PATH) -> None:
+        self.path: str = path
+        self.directory: str = os.path.dirname(path)
+        self.segments: List[Dict[str, Any]] = []
+        if os.path.exists(path):
+            with open(path) as f:
+                self.segments = json.load(f)["segments"]
+
+    def save(self) -> None:
+        # Write then rename so readers never see a partial index
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"segments": self.segments}, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _name(self, path: str) -> str:
+        return os.path.relpath(path, self.directory or ".")
+
+    def update(self, path: str, first: float, last: float, rows: int) -> None:
+        name = self._name(path)
+        entry = {"path": name, "first": first, "last": last, "rows": rows}
+        if self.segments and self.segments[-1]["path"] == name:
+            self.segments[-1] = entry
+        else:
+            self.segments.append(entry)
+
+    def refresh(self, path: str) -> None:
+        """Re-derive a segment's entry from the records left in its file.
+
+        Used after recover() has truncated or deleted a segment; the entry
+        is dropped when nothing readable remains.
+        """
+        name = self._name(path)
+        records = (
+            read_history(path)
+            if os.path.exists(path)
+            else np.empty(0, dtype=HISTORY_DTYPE)
+        )
+        for i, segment in enumerate(self.segments):
+            if segment["path"] != name:
+                continue
+            if len(records):
+                timestamps = records["timestamp"]
+                segment.update(
+                    first=float(timestamps[0]),
+                    last=float(timestamps[-1]),
+                    rows=len(records),
+                )
+            else:
+                del self.segments[i]
+            return
+
+    def overlapping(
+        self, start: Optional[float] = None, end: Optional[float] = None
+    ) -> List[str]:
+        """Paths of segments with data inside [start, end], oldest first"""
+        return [
+            os.path.join(self.directory, segment["path"])
+            for segment in self.segments
+            if (start is None or segment["last"] >= start)
+            and (end is None or segment["first"] <= end)
+        ]
+
+    def read(
+        self, start: Optional[float] = None, end: Optional[float] = None
+    ) -> np.ndarray:
+        parts = [
+            read_history(path, start, end)
+            for path in self.overlapping(start, end)
+            if os.path.exists(path)
+        ]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=HISTORY_DTYPE)
+
+    def tail(self, n: int) -> np.ndarray:
+        """Last `n` records, reading back across as many segments as needed"""
+        parts: List[np.ndarray] = []
+        remaining = n
+        for path in reversed(self.overlapping()):
+            if remaining <= 0:
+                break
+            if not os.path.exists(path):
+                continue
+            part = tail_history(path, remaining)
+            parts.insert(0, part)
+            remaining -= len(part)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=HISTORY_DTYPE)
+
+
+class SegmentedWriter(BatchedWriter):
+    """Splits history into segment files and keeps a SegmentIndex up to date.
+
+    A new segment is started when a row falls into a new `segment_interval`
+    period (aligned to local midnight for the daily default) or after the
+    current segment has grown past `segment_bytes`. Each flush writes the
+    batch through the segment writer, syncs it and then rewrites the index.
+    """
+
+    def __init__(
+        self,
+        storage_format: StorageFormat,
+        index_path: str = INDEX_PATH,
+        segment_interval: Optional[float] = 24 * 60 * 60,
+        segment_bytes: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        if storage_format == "sqlite":
+            raise ValueError("SQLite history is not segmented")
+
+        super().__init__("", **kwargs)
+        self.storage_format: StorageFormat = storage_format
+        self.segment_interval: Optional[float] = segment_interval
+        self.segment_bytes: Optional[int] = segment_bytes
+        self.index: SegmentIndex = SegmentIndex(index_path)
+        self._segment: Optional[BatchedWriter] = None
+        self._period: Optional[int] = None
+        self._first: float = 0.0
+        self._last: float = 0.0
+        self._rows: int = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def _write_rows(self, rows: List[Sequence[Any]]) -> None:
+        for row in rows:
+            if self._should_roll(row[0]):
+                self._roll(row[0])
+            assert self._segment is not None
+            self._segment.write(row)
+            self._last = row[0]
+            self._rows += 1
+        self._flush_segment()
+
+    def _period_of(self, timestamp: float) -> Optional[int]:
+        if self.segment_interval is None:
+            return None
+        local = timestamp + time.localtime(timestamp).tm_gmtoff
+        return int(local // self.segment_interval)
+
+    def _should_roll(self, timestamp: float) -> bool:
+        if self._segment is None:
+            return True
+        if self._period_of(timestamp) != self._period:
+            return True
+        return (
+            self.segment_bytes is not None
+            and os.path.getsize(self.path) >= self.segment_bytes
+        )
+
+    def _roll(self, timestamp: float) -> None:
+        if self._segment is not None:
+            self._flush_segment()
+            self._segment.close()
+
+        self.path = history_path(self.storage_format, timestamp)
+        # The segment is flushed explicitly alongside the index
+        self._segment = WRITERS[self.storage_format](
+            self.path, flush_rows=2**31, flush_interval=math.inf, fsync=self.fsync
+        )
+        self._period = self._period_of(timestamp)
+        self._first = timestamp
+        self._last = timestamp
+        self._rows = 0
+
+    def _flush_segment(self) -> None:
+        if self._segment is None:
+            return
+        self._segment.flush()
+        self.index.update(self.path, self._first, self._last, self._rows)
+        self.index.save()
+
+
+def tail_previous(storage_format: StorageFormat, n: int) -> np.ndarray:
+    """Last `n` records written by an earlier run in `storage_format`"""
+    if storage_format == "sqlite":
+        path: Optional[str] = SQLITE_PATH if os.path.exists(SQLITE_PATH) else None
+    elif os.path.exists(INDEX_PATH):
+        return SegmentIndex(INDEX_PATH).tail(n)
+    else:
+        path = latest_history_file()
+    if path is None:
+        return np.empty(0, dtype=HISTORY_DTYPE)
+    return tail_history(path, n)
+
+
+FullPolicy = Literal["block", "drop_oldest", "drop_newest"]
+
+
+class WriterStats(NamedTuple):
+    queue_depth: int
+    queue_size: int
+    written: int
+    dropped: int
+    last_latency: float
+    mean_latency: float
+    max_latency: float
+
+
+class BackgroundWriter:
+    """Feeds rows to a sink on a dedicated thread through a bounded queue.
+
+    `full_policy` decides what happens when the queue is full: "block" waits
+    for space, "drop_oldest" discards the oldest queued row and "drop_newest"
+    discards the incoming one. The sink's flush() is also called when the
+    queue has been idle for `flush_interval` seconds so time-based flushing
+    still happens when rows stop arriving.
+    """
+
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(
+        self,
+        sink: Any,
+        queue_size: int = 1024,
+        full_policy: FullPolicy = "drop_oldest",
+        flush_interval: float = 10.0,
+    ) -> None:
+        if full_policy not in ("block", "drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown full_policy: {full_policy}")
+
+        self.sink = sink
+        self.full_policy: FullPolicy = full_policy
+        self.flush_interval: float = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stats_lock: Lock = Lock()
+        self._written: int = 0
+        self._dropped: int = 0
+        self._last_latency: float = 0.0
+        self._total_latency: float = 0.0
+        self._max_latency: float = 0.0
+
+        self._thread: Thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, row: Sequence[Any]) -> None:
+        if self.full_policy == "block":
+            self._queue.put(row)
+            return
+
+        while True:
+            try:
+                self._queue.put_nowait(row)
+                return
+            except queue.Full:
+                if self.full_policy == "drop_newest":
+                    self._count_drop()
+                    return
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                continue
+            if item is self._FLUSH or item is self._STOP:
+                # Control markers are never dropped; requeue them behind the
+                # rows before marking the old entry done so join() keeps waiting
+                self._queue.put(item)
+                self._queue.task_done()
+                continue
+            self._queue.task_done()
+            self._count_drop()
+
+    def flush(self) -> None:
+        """Block until every queued row has been handed to the sink and flushed"""
+        self._queue.put(self._FLUSH)
+        self._queue.join()
+
+    def close(self) -> None:
+        if not self._thread.is_alive():
+            return
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self.sink.close()
+
+    def stats(self) -> WriterStats:
+        with self._stats_lock:
+            return WriterStats(
+                queue_depth=self._queue.qsize(),
+                queue_size=self._queue.maxsize,
+                written=self._written,
+                dropped=self._dropped,
+                last_latency=self._last_latency,
+                mean_latency=(
+                    self._total_latency / self._written if self._written else 0.0
+                ),
+                max_latency=self._max_latency,
+            )
+
+    def _count_drop(self) -> None:
+        with self._stats_lock:
+            self._dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._call(self.sink.flush)
+                continue
+
+            try:
+                if item is self._STOP:
+                    return
+                if item is self._FLUSH:
+                    self._call(self.sink.flush)
+                    continue
+
+                start = time.perf_counter()
+                if self._call(self.sink.write, item):
+                    latency = time.perf_counter() - start
+                    with self._stats_lock:
+                        self._written += 1
+                        self._last_latency = latency
+                        self._total_latency += latency
+                        self._max_latency = max(self._max_latency, latency)
+            finally:
+                self._queue.task_done()
+
+    def _call(self, fn: Any, *args: Any) -> bool:
+        try:
+            fn(*args)
+            return True
+        except Exception as e:
+            print(f"Storage error: {e}")
+            return False
+
+
+if __name__ == "__main__":
+    import fire
+
+    fire.Fire({"binary_to_csv": binary_to_csv})
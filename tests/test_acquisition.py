@@ -0,0 +1,85 @@
+import time
+
+from acquisition import CircuitBreaker, SensorState, SensorWorker
+
+
+def failing_after(values, good_reads):
+    calls = {"n": 0}
+
+    def read():
+        calls["n"] += 1
+        if calls["n"] > good_reads:
+            raise RuntimeError("device gone")
+        return values
+
+    return read
+
+
+def test_breaker_opens_after_threshold():
+    state = SensorState()
+    worker = SensorWorker(
+        "pms5003", failing_after({"pm25": 7.0}, 1), 1.0, state, CircuitBreaker()
+    )
+
+    assert worker.poll()
+    assert state.merged() == {"pm25": 7.0}
+    assert not worker.poll()
+    assert not worker.poll()
+    assert worker.available
+    assert not worker.poll()
+    assert worker.breaker.state == "open"
+    assert not worker.available
+
+
+def test_opening_breaker_drops_stale_sample():
+    state = SensorState()
+    worker = SensorWorker(
+        "pms5003",
+        failing_after({"pm25": 7.0}, 1),
+        1.0,
+        state,
+        CircuitBreaker(threshold=1, base_delay=0.01),
+    )
+
+    assert worker.poll()
+    assert not worker.poll()
+    assert state.get("pms5003") is None
+
+    # Half-open: the trial read is allowed, but the pre-outage value must
+    # not come back as if it were fresh
+    time.sleep(0.02)
+    assert worker.breaker.state == "half_open"
+    assert worker.available
+    assert state.merged() == {}
+
+
+def test_silent_sensor_opens_breaker():
+    results = [{"co2": 800}]
+    state = SensorState()
+    worker = SensorWorker(
+        "scd41",
+        lambda: results.pop() if results else None,
+        0.5,
+        state,
+        CircuitBreaker(threshold=2, base_delay=0.01),
+        max_age=0.05,
+    )
+
+    assert worker.poll()
+    assert state.merged() == {"co2": 800}
+    # No data yet, but within max_age: the previous sample stands
+    assert worker.poll()
+    assert worker.breaker.consecutive_failures == 0
+
+    time.sleep(0.06)
+    assert not worker.poll()
+    assert not worker.poll()
+    assert not worker.available
+    assert state.get("scd41") is None
+
+    # Data arriving again on the half-open trial closes the breaker
+    time.sleep(0.02)
+    results.append({"co2": 650})
+    assert worker.poll()
+    assert worker.breaker.state == "closed"
+    assert state.merged() == {"co2": 650}
@@ -0,0 +1,207 @@
+import os
+import random
+from typing import NamedTuple, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import display
+from display import DisplayManager, PartialUpdateDevice
+
+WIDTH, HEIGHT = 128, 128
+
+
+class FrameDevice:
+    """Device without page addressing, like dev_utils' MockSH1106"""
+
+    def __init__(self, width=WIDTH, height=HEIGHT):
+        self.width = width
+        self.height = height
+        self.frames = []
+
+    def display(self, image):
+        self.frames.append(image)
+
+
+class FakeSH1106:
+    """Applies page/column commands and data to a simulated 132-column RAM"""
+
+    def __init__(self, height=HEIGHT, **attributes):
+        self.ram = np.full((height // 8, 132), 0xAA, dtype=np.uint8)
+        self.page = self.column = 0
+        self.bytes = 0
+        self.__dict__.update(attributes)
+
+    def preprocess(self, image):
+        return image
+
+    def command(self, *cmd):
+        self.bytes += len(cmd)
+        for byte in cmd:
+            if 0xB0 <= byte <= 0xBF:
+                self.page = byte - 0xB0
+            elif byte < 0x10:
+                self.column = (self.column & 0xF0) | byte
+            elif byte < 0x20:
+                self.column = (self.column & 0x0F) | (byte & 0x0F) << 4
+
+    def data(self, data):
+        self.bytes += len(data)
+        for byte in data:
+            self.ram[self.page, self.column] = byte
+            self.column += 1
+
+
+def full_frame(image, offset=2):
+    """RAM contents after writing `image` pixel by pixel, for comparison"""
+    pixels = image.load()
+    pages = np.zeros((image.height // 8, image.width), dtype=np.uint8)
+    for page in range(image.height // 8):
+        for x in range(image.width):
+            for bit in range(8):
+                if pixels[x, page * 8 + bit]:
+                    pages[page, x] |= 1 << bit
+    return pages, slice(offset, offset + image.width)
+
+
+def assert_shows(device, image, offset=2):
+    pages, columns = full_frame(image, offset)
+    assert np.array_equal(device.ram[:, columns], pages)
+
+
+def test_device_without_page_addressing_gets_whole_frames():
+    device = FrameDevice()
+    wrapper = PartialUpdateDevice(device)
+    image = Image.new("1", (128, 64))
+
+    wrapper.display(image)
+    wrapper.display(image)
+    assert device.frames == [image, image]
+
+
+def test_first_frame_is_written_in_full():
+    device = FakeSH1106()
+    wrapper = PartialUpdateDevice(device)
+    image = Image.new("1", (WIDTH, HEIGHT))
+    ImageDraw.Draw(image).text((10, 40), "CO2 812", fill=1)
+
+    wrapper.display(image)
+    assert_shows(device, image)
+    assert wrapper.segments_sent == HEIGHT // 8
+
+
+def test_identical_frame_sends_nothing():
+    device = FakeSH1106()
+    wrapper = PartialUpdateDevice(device)
+    image = Image.new("1", (WIDTH, HEIGHT))
+    ImageDraw.Draw(image).ellipse((20, 20, 100, 100), outline=1)
+    wrapper.display(image)
+    sent = device.bytes
+
+    wrapper.display(image.copy())
+    assert device.bytes == sent
+    assert wrapper.bytes_sent == sent
+
+
+def test_sparse_change_sends_only_its_segment():
+    device = FakeSH1106()
+    wrapper = PartialUpdateDevice(device)
+    image = Image.new("1", (WIDTH, HEIGHT))
+    wrapper.display(image)
+    sent = device.bytes
+
+    image.putpixel((50, 21), 1)  # Page 2
+    image.putpixel((53, 22), 1)  # Close enough to merge into one run
+    image.putpixel((90, 22), 1)  # A separate run
+    wrapper.display(image)
+    assert_shows(device, image)
+    assert device.bytes - sent == (3 + 4) + (3 + 1)
+
+
+def test_page_address_offset_from_device():
+    device = FakeSH1106(_page_address_offset=0)
+    wrapper = PartialUpdateDevice(device)
+    image = Image.new("1", (WIDTH, HEIGHT))
+    image.putpixel((0, 0), 1)
+
+    wrapper.display(image)
+    assert_shows(device, image, offset=0)
+
+
+def test_random_frames_match_full_frame_writes():
+    rng = random.Random(1)
+    device = FakeSH1106()
+    wrapper = PartialUpdateDevice(device)
+    image = Image.new("1", (WIDTH, HEIGHT))
+
+    for _ in range(200):
+        draw = ImageDraw.Draw(image)
+        if rng.random() < 0.05:
+            image = Image.frombytes(
+                "1", (WIDTH, HEIGHT), rng.randbytes(WIDTH * HEIGHT // 8)
+            )
+        else:
+            for _ in range(rng.randint(0, 4)):
+                x, y = rng.randrange(WIDTH), rng.randrange(HEIGHT)
+                w, h = rng.randint(0, 20), rng.randint(0, 20)
+                draw.rectangle((x, y, x + w, y + h), fill=rng.randint(0, 1))
+        wrapper.display(image)
+        assert_shows(device, image)
+
+
+class TextReference:
+    """draw.text-based stand-in for a GlyphAtlas, as the display drew before"""
+
+    def __init__(self, font):
+        self.font = font
+
+    def textlength(self, text):
+        return self.font.getlength(text)
+
+    def draw(self, draw, xy, text):
+        draw.text(xy, text, font=self.font, fill=1)
+
+
+class Reading(NamedTuple):
+    temperature: Optional[float]
+    humidity: Optional[float]
+    co2: Optional[float]
+    tvoc: Optional[float]
+    pm25: Optional[float]
+    timestamp: float
+
+
+def test_glyph_atlas_matches_draw_text(monkeypatch):
+    # Fonts are loaded relative to the repository root
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(display.__file__)))
+    atlas_device, reference_device = FrameDevice(), FrameDevice()
+    atlas = DisplayManager(atlas_device)
+    reference = DisplayManager(reference_device)
+    assert isinstance(atlas.large_font, ImageFont.FreeTypeFont)
+    reference.large_glyphs = TextReference(reference.large_font)
+    reference.small_glyphs = TextReference(reference.small_font)
+    reference.emoji_glyphs = TextReference(reference.emoji_font)
+
+    rng = random.Random(25)
+    clock = [0.0]
+    monkeypatch.setattr(display.time, "time", lambda: clock[0])
+
+    def field(low, high):
+        return None if rng.random() < 0.05 else rng.uniform(low, high)
+
+    for i in range(600):
+        # Step the clock so every page comes round
+        clock[0] = 1_700_000_000 + i * atlas.page_interval / 2
+        reading = Reading(
+            temperature=field(-20, 45),
+            humidity=field(0, 100),
+            co2=field(300, 5000),
+            tvoc=field(0, 1500),
+            pm25=field(0, 300),
+            timestamp=clock[0] + rng.uniform(0, 86400),
+        )
+        atlas.update(reading)
+        reference.update(reading)
+        assert (
+            atlas_device.frames[-1].tobytes() == reference_device.frames[-1].tobytes()
+        )
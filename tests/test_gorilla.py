@@ -0,0 +1,103 @@
+import math
+import random
+import struct
+
+from gorilla import BitReader, BitWriter, GorillaEncoder, decode_block
+
+
+def float32(value):
+    return struct.unpack("<f", struct.pack("<f", value))[0]
+
+
+def encode(rows, columns):
+    encoder = GorillaEncoder(columns)
+    for timestamp, values in rows:
+        encoder.add(timestamp, values)
+    count = encoder.rows
+    return encoder.finish(), count
+
+
+def assert_round_trip(rows, columns):
+    data, count = encode(rows, columns)
+    decoded = list(decode_block(data, count, columns))
+
+    assert len(decoded) == len(rows)
+    for (timestamp, values), (got_time, got_values) in zip(rows, decoded):
+        assert round(got_time * 1000) == round(timestamp * 1000)
+        for value, got in zip(values, got_values):
+            if math.isnan(value):
+                assert math.isnan(got)
+            else:
+                assert got == float32(value)
+
+
+def test_bit_round_trip():
+    writer = BitWriter()
+    fields = [(1, 1), (0b101, 3), (2**63 + 5, 64), (-3 & 0x7F, 7), (0, 2)]
+    for value, nbits in fields:
+        writer.write(value, nbits)
+
+    reader = BitReader(writer.getvalue())
+    assert [reader.read(nbits) for _, nbits in fields[:3]] == [1, 0b101, 2**63 + 5]
+    assert reader.read_signed(7) == -3
+    assert reader.read(2) == 0
+
+
+def test_round_trip_regular_samples():
+    random.seed(1)
+    start = 1_700_000_000.0
+    rows = [
+        (
+            start + i,
+            [
+                21 + random.gauss(0, 0.2),
+                45 + random.gauss(0, 1),
+                float(400 + i % 7),
+                float(random.randint(0, 60000)),
+                400.0,
+            ],
+        )
+        for i in range(500)
+    ]
+    assert_round_trip(rows, 5)
+
+
+def test_round_trip_jitter_and_every_delta_bucket():
+    start = 1_700_000_000.0
+    # Delta-of-delta values that land in the 0, 7, 9 and 12 bit buckets
+    offsets = [0, 1, 2, 3.05, 4, 4.2, 5.5, 6, 8.047, 9, 10.001]
+    rows = [(start + offset, [float(i)]) for i, offset in enumerate(offsets)]
+    assert_round_trip(rows, 1)
+
+
+def test_round_trip_large_gaps_use_64_bit_fallback():
+    start = 1_700_000_000.0
+    # Gaps of an hour, a day and a year, then back to 1 s spacing
+    times = [start, start + 1, start + 3601, start + 90001, start + 31_626_001]
+    times += [times[-1] + 1, times[-1] + 2]
+    rows = [(t, [float(i), -float(i)]) for i, t in enumerate(times)]
+    assert_round_trip(rows, 2)
+
+
+def test_round_trip_nan_and_special_values():
+    start = 1_700_000_000.0
+    values = [0.0, float("nan"), -0.0, 1e-30, 3.4e38, float("nan"), 1.0, 1.0]
+    rows = [(start + i, [value]) for i, value in enumerate(values)]
+    assert_round_trip(rows, 1)
+
+
+def test_single_row_and_empty_block():
+    assert list(decode_block(b"", 0, 3)) == []
+    assert_round_trip([(1_700_000_000.123, [1.5, 2.5, 3.5])], 3)
+
+
+def test_finish_resets_encoder():
+    encoder = GorillaEncoder(1)
+    encoder.add(1_700_000_000.0, [1.0])
+    encoder.add(1_700_000_001.0, [2.0])
+    first = encoder.finish()
+    assert encoder.rows == 0
+
+    encoder.add(1_700_000_000.0, [1.0])
+    encoder.add(1_700_000_001.0, [2.0])
+    assert encoder.finish() == first
@@ -0,0 +1,160 @@
+import math
+import random
+from collections import deque
+
+import numpy as np
+import pytest
+
+from history import RingBuffer, RollingWindow, RollupTier
+
+
+def test_rollup_weights_means_by_valid_samples():
+    hours = RollupTier(3600, 24, ["pm25"])
+    minutes = RollupTier(60, 120, ["pm25"], parent=hours)
+
+    # One valid sample in the first minute, a full minute of zeros after it
+    minutes.add_sample(0, [100.0])
+    for t in range(1, 60):
+        minutes.add_sample(t, [np.nan])
+    for t in range(60, 120):
+        minutes.add_sample(t, [0.0])
+    minutes.add_sample(3600, [0.0])
+    hours.add_sample(7200, [0.0])
+
+    assert minutes.view("pm25_count").tolist() == [1, 60]
+    assert hours.view("count").tolist() == [120]
+    assert hours.view("pm25_count").tolist() == [61]
+    assert hours.view("pm25_mean")[0] == np.float32(100 / 61)
+    assert hours.view("pm25_max")[0] == 100
+
+
+def test_rollup_all_nan_field_stays_nan():
+    minutes = RollupTier(60, 10, ["pm25", "co2"])
+    for t in range(60):
+        minutes.add_sample(t, [np.nan, 400.0])
+    minutes.add_sample(60, [np.nan, 400.0])
+
+    assert np.isnan(minutes.view("pm25_mean")[0])
+    assert minutes.view("pm25_count")[0] == 0
+    assert minutes.view("co2_mean")[0] == 400
+
+
+RING_DTYPE = np.dtype([("timestamp", "<f8"), ("value", "<f4")])
+
+
+def test_ring_buffer_orders_views_oldest_first():
+    ring = RingBuffer(RING_DTYPE, 4)
+    assert len(ring) == 0
+    assert ring.view("value").tolist() == []
+
+    for t in range(3):
+        ring.append((t, t * 10))
+    assert len(ring) == 3
+    assert ring.view("timestamp").tolist() == [0, 1, 2]
+    assert ring.view("value", 2).tolist() == [10, 20]
+
+
+def test_ring_buffer_wraps_around_like_a_deque():
+    ring = RingBuffer(RING_DTYPE, 5)
+    reference = deque(maxlen=5)
+    for t in range(23):
+        ring.append((t, -t))
+        reference.append(t)
+        assert ring.view("timestamp").tolist() == list(reference)
+        for n in (0, 1, 3, 5, 9):
+            expected = list(reference)[-n:] if n else []
+            assert ring.view("timestamp", n).tolist() == expected
+    assert len(ring) == 5
+
+
+def test_ring_buffer_views_do_not_copy():
+    ring = RingBuffer(RING_DTYPE, 3)
+    for t in range(7):
+        ring.append((t, t))
+    view = ring.view("value")
+    assert np.shares_memory(view, ring.columns["value"])
+
+
+def test_ring_buffer_window():
+    ring = RingBuffer(RING_DTYPE, 8)
+    for t in range(12):
+        ring.append((t, t * 2))
+
+    assert ring.window("value", 6, 8).tolist() == [12, 14, 16]
+    assert ring.window("value", 9.5).tolist() == [20, 22]
+    # Older than anything still held
+    assert ring.window("value", 0, 3).tolist() == []
+
+
+def test_ring_buffer_rejects_empty_capacity():
+    with pytest.raises(ValueError):
+        RingBuffer(RING_DTYPE, 0)
+
+
+def brute_force_stats(samples, now, window):
+    values = [v for t, v in samples if t > now - window and not math.isnan(v)]
+    if not values:
+        return None
+    mean = sum(values) / len(values)
+    std = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+    return mean, min(values), max(values), std, len(values)
+
+
+def test_rolling_window_matches_brute_force():
+    rng = random.Random(6)
+    window = RollingWindow(10.0, ["co2"])
+    samples = []
+    t = 0.0
+    for _ in range(2000):
+        t += rng.choice([0.5, 1.0, 1.0, 3.0, 12.0])
+        value = math.nan if rng.random() < 0.1 else rng.uniform(400, 2000)
+        samples.append((t, value))
+        window.add(t, [value])
+
+        stats = window.stats("co2")
+        expected = brute_force_stats(samples, t, 10.0)
+        if expected is None:
+            assert stats.count == 0
+            assert math.isnan(stats.mean) and math.isnan(stats.max)
+            continue
+        mean, low, high, std, count = expected
+        assert stats.count == count
+        assert stats.mean == pytest.approx(mean)
+        assert stats.min == low
+        assert stats.max == high
+        assert stats.std == pytest.approx(std, abs=1e-3)
+
+
+def test_rolling_window_evicts_at_the_edge():
+    window = RollingWindow(10.0, ["pm25"])
+    window.add(0.0, [50.0])
+    window.add(5.0, [1.0])
+    assert window.stats("pm25").max == 50.0
+
+    # A sample exactly `window` seconds old has left the window
+    window.add(10.0, [2.0])
+    stats = window.stats("pm25")
+    assert stats.count == 2
+    assert stats.max == 2.0
+    assert stats.min == 1.0
+
+
+def test_rolling_window_ignores_nan():
+    window = RollingWindow(60.0, ["tvoc", "pm25"])
+    window.add(0.0, [math.nan, 4.0])
+    window.add(1.0, [math.nan, 6.0])
+
+    tvoc = window.stats("tvoc")
+    assert tvoc.count == 0
+    assert math.isnan(tvoc.mean) and math.isnan(tvoc.ewma)
+    pm25 = window.stats("pm25")
+    assert (pm25.count, pm25.mean, pm25.min, pm25.max) == (2, 5.0, 4.0, 6.0)
+
+
+def test_rolling_window_ewma_uses_window_time_constant():
+    window = RollingWindow(10.0, ["co2"])
+    window.add(0.0, [400.0])
+    window.add(10.0, [1400.0])
+    assert window.stats("co2").ewma == pytest.approx(
+        400.0 + (1 - math.exp(-1)) * 1000.0
+    )
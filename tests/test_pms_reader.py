@@ -0,0 +1,69 @@
+import struct
+
+from pms_reader import FRAME_SIZE, PMS5003Reader
+
+
+def frame(pm=(3, 5, 8), corrupt=False):
+    words = [*pm, *pm, 300, 200, 100, 50, 20, 10, 0]
+    body = struct.pack(">13H", *words)
+    header = b"\x42\x4d" + struct.pack(">H", len(body) + 2)
+    checksum = sum(header) + sum(body) + (1 if corrupt else 0)
+    return header + body + struct.pack(">H", checksum)
+
+
+def pm25_values(reader):
+    return [f.data[1] for f in reader.since(0)]
+
+
+def test_frame_size():
+    assert len(frame()) == FRAME_SIZE
+
+
+def test_noise_before_header_is_discarded():
+    reader = PMS5003Reader(port=None)
+    reader.feed(b"\x00\x13\x37\x42\x42" + frame((1, 2, 3)))
+
+    assert pm25_values(reader) == [2]
+    assert reader.discarded_bytes == 5
+    assert reader.checksum_errors == 0
+
+
+def test_bad_length_field_resyncs_on_next_header():
+    reader = PMS5003Reader(port=None)
+    reader.feed(b"\x42\x4d\x00\x05junk" + frame((4, 5, 6)))
+
+    assert pm25_values(reader) == [5]
+    assert reader.discarded_bytes == 8
+
+
+def test_checksum_failure_drops_frame_and_keeps_the_next():
+    reader = PMS5003Reader(port=None)
+    reader.feed(frame((9, 9, 9), corrupt=True) + frame((1, 2, 3)))
+
+    assert pm25_values(reader) == [2]
+    assert reader.checksum_errors == 1
+    assert reader.frames == 1
+
+
+def test_frame_split_across_chunks():
+    data = frame((1, 2, 3)) + frame((4, 5, 6))
+    for size in (1, 3, 7, 31):
+        reader = PMS5003Reader(port=None)
+        for i in range(0, len(data), size):
+            reader.feed(data[i : i + size])
+        assert pm25_values(reader) == [2, 5], size
+        assert reader.discarded_bytes == 0
+
+
+def test_average_covers_frames_since_last_call():
+    reader = PMS5003Reader(port=None)
+    assert reader.average() is None
+
+    reader.feed(frame((1, 2, 3)) + frame((3, 4, 5)))
+    assert reader.average() == {"pm10": 2.0, "pm25": 3.0, "pm100": 4.0}
+    assert reader.average() is None
+
+    reader.feed(frame((7, 8, 9)))
+    assert reader.average() == {"pm10": 7.0, "pm25": 8.0, "pm100": 9.0}
+    assert reader.latest().data[:3] == (7, 8, 9)
+
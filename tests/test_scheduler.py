@@ -0,0 +1,78 @@
+import pytest
+
+import scheduler
+from scheduler import DeadlineScheduler
+
+
+class Clock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    return clock
+
+
+def test_work_time_does_not_drift(clock):
+    schedule = DeadlineScheduler(1.0)
+    schedule.reset()
+    starts = []
+    for _ in range(10):
+        clock.now += schedule.next_delay()
+        schedule.tick()
+        starts.append(clock.now)
+        clock.now += 0.3  # Work done in each tick
+
+    assert starts == pytest.approx([101.0 + i for i in range(10)])
+    assert schedule.overruns == 0
+    assert schedule.stats().max_jitter == 0.0
+
+
+def test_overrun_skips_to_next_future_deadline(clock):
+    schedule = DeadlineScheduler(1.0, skip_missed=True)
+    schedule.reset()
+    clock.now += schedule.next_delay()
+    schedule.tick()
+
+    clock.now += 3.5  # Work overruns the next three deadlines
+    delay = schedule.next_delay()
+    assert schedule.overruns == 1
+    assert schedule.skipped == 3
+    assert delay == pytest.approx(0.5)
+    clock.now += delay
+    assert clock.now == pytest.approx(105.0)
+
+
+def test_overrun_catches_up_without_skipping(clock):
+    schedule = DeadlineScheduler(1.0, skip_missed=False)
+    schedule.reset()
+    clock.now += schedule.next_delay()
+    schedule.tick()
+
+    clock.now += 3.5
+    # The missed deadlines at 102, 103 and 104 run back to back
+    delays = [schedule.next_delay() for _ in range(3)]
+    assert delays == [0.0, 0.0, 0.0]
+    assert schedule.overruns == 3
+    assert schedule.skipped == 0
+    assert schedule.next_delay() == pytest.approx(0.5)
+
+
+def test_stats_rate_and_jitter(clock):
+    schedule = DeadlineScheduler(0.5)
+    schedule.reset()
+    for late in (0.0, 0.1, 0.0, 0.2):
+        clock.now += schedule.next_delay() + late
+        schedule.tick()
+
+    stats = schedule.stats()
+    assert stats.ticks == 4
+    assert stats.rate == pytest.approx(3 / 1.7)
+    assert stats.mean_jitter == pytest.approx(0.075)
+    assert stats.max_jitter == pytest.approx(0.2)
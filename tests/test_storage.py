@@ -0,0 +1,300 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from storage import (
+    CHECKSUM_SUFFIX,
+    EXTENSIONS,
+    HISTORY_DTYPE,
+    WRITERS,
+    BackgroundWriter,
+    SegmentedWriter,
+    SegmentIndex,
+    read_history,
+    recover,
+    tail_history,
+)
+
+
+class GatedSink:
+    """Sink whose writes block until `gate` is set"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.calls = []
+        self.closed = False
+
+    def write(self, row):
+        self.gate.wait()
+        self.calls.append(row)
+
+    def flush(self):
+        self.calls.append("flush")
+
+    def close(self):
+        self.closed = True
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_drop_oldest_never_drops_flush_marker():
+    sink = GatedSink()
+    writer = BackgroundWriter(sink, queue_size=2, flush_interval=60)
+    writer.write((1,))
+    wait_for(lambda: writer.stats().queue_depth == 0)  # Row 1 is in the sink
+
+    writer.write((2,))
+    flusher = threading.Thread(target=writer.flush, daemon=True)
+    flusher.start()
+    wait_for(lambda: writer.stats().queue_depth == 2)
+
+    writer.write((3,))  # Evicts row 2
+    writer.write((4,))  # Would evict the flush marker
+    sink.gate.set()
+    flusher.join(timeout=2)
+
+    assert not flusher.is_alive()
+    assert "flush" in sink.calls
+    assert writer.stats().dropped == 2
+    writer.close()
+
+
+def test_close_completes_when_queue_is_full():
+    sink = GatedSink()
+    writer = BackgroundWriter(sink, queue_size=2, flush_interval=60)
+    writer.write((1,))
+    wait_for(lambda: writer.stats().queue_depth == 0)
+    writer.write((2,))
+
+    closer = threading.Thread(target=writer.close, daemon=True)
+    closer.start()
+    wait_for(lambda: writer.stats().queue_depth == 2)
+    writer.write((3,))
+    writer.write((4,))
+    sink.gate.set()
+    closer.join(timeout=2)
+
+    assert not closer.is_alive()
+    assert sink.closed
+
+
+FILE_FORMATS = ["csv", "binary", "gorilla"]
+
+
+def write_history(path, storage_format, blocks=3, rows_per_block=10):
+    """Write `blocks` flushed blocks of rows, one second apart"""
+    writer = WRITERS[storage_format](path, flush_rows=rows_per_block, fsync=False)
+    for i in range(blocks * rows_per_block):
+        writer.write((1_700_000_000.0 + i, 21.5, 45.0, 400, 10, 400, 1, 2, 3))
+    writer.close()
+
+
+def history_file(tmp_path, storage_format):
+    path = str(tmp_path / f"history{EXTENSIONS[storage_format]}")
+    write_history(path, storage_format)
+    return path
+
+
+@pytest.mark.parametrize("storage_format", FILE_FORMATS)
+def test_recover_intact_file_is_untouched(tmp_path, storage_format):
+    path = history_file(tmp_path, storage_format)
+    size = os.path.getsize(path)
+
+    assert recover(path) == 0
+    assert os.path.getsize(path) == size
+    assert len(read_history(path)) == 30
+
+
+@pytest.mark.parametrize("storage_format", FILE_FORMATS)
+def test_recover_cuts_torn_tail(tmp_path, storage_format):
+    path = history_file(tmp_path, storage_format)
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b"\x42" * 17)  # Block written but its sidecar entry never was
+
+    assert recover(path) == 17
+    assert os.path.getsize(path) == size
+    assert len(read_history(path)) == 30
+
+
+@pytest.mark.parametrize("storage_format", FILE_FORMATS)
+def test_recover_drops_corrupted_last_block(tmp_path, storage_format):
+    path = history_file(tmp_path, storage_format)
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.seek(size - 3)
+        f.write(b"\xff\xfe\xfd")
+
+    assert recover(path) > 0
+    records = read_history(path)
+    assert len(records) == 20
+    assert records["timestamp"][-1] == 1_700_000_019.0
+    # The sidecar now ends at the last intact block
+    assert recover(path) == 0
+
+
+@pytest.mark.parametrize("storage_format", FILE_FORMATS)
+def test_recover_deletes_file_without_header_entry(tmp_path, storage_format):
+    path = history_file(tmp_path, storage_format)
+    size = os.path.getsize(path)
+    # Header and rows reached disk, but no sidecar entry did
+    open(path + CHECKSUM_SUFFIX, "wb").close()
+
+    assert recover(path) == size
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + CHECKSUM_SUFFIX)
+
+
+@pytest.mark.parametrize("storage_format", ["binary", "gorilla"])
+def test_tail_history_skips_unreadable_file(tmp_path, storage_format):
+    path = str(tmp_path / f"history{EXTENSIONS[storage_format]}")
+    with open(path, "wb") as f:
+        f.write(b"AQ")
+
+    records = tail_history(path, 10)
+    assert len(records) == 0
+    assert records.dtype == HISTORY_DTYPE
+
+
+DAY = 24 * 60 * 60
+# Local midnight, so daily segments split exactly between the two days
+MIDNIGHT = datetime(2023, 11, 14).timestamp()
+
+
+def write_segments(storage_format, days=2, blocks=3, rows_per_block=10, **kwargs):
+    """Write `blocks` flushed blocks per day into a SegmentedWriter in the cwd"""
+    writer = SegmentedWriter(
+        storage_format, flush_rows=rows_per_block, fsync=False, **kwargs
+    )
+    for day in range(days):
+        for i in range(blocks * rows_per_block):
+            writer.write((MIDNIGHT + day * DAY + i, 21.5, 45.0, 400, 10, 400, 1, 2, 3))
+    writer.close()
+    return SegmentIndex()
+
+
+@pytest.mark.parametrize("storage_format", FILE_FORMATS)
+def test_refresh_drops_deleted_segment(tmp_path, monkeypatch, storage_format):
+    monkeypatch.chdir(tmp_path)
+    newest = write_segments(storage_format).overlapping()[-1]
+    open(newest + CHECKSUM_SUFFIX, "wb").close()
+    recover(newest)
+
+    index = SegmentIndex()
+    index.refresh(newest)
+    index.save()
+
+    index = SegmentIndex()
+    assert len(index.segments) == 1
+    assert len(index.read()) == 30
+    assert len(index.tail(100)) == 30
+
+
+@pytest.mark.parametrize("storage_format", FILE_FORMATS)
+def test_refresh_rewrites_truncated_segment(tmp_path, monkeypatch, storage_format):
+    monkeypatch.chdir(tmp_path)
+    newest = write_segments(storage_format).overlapping()[-1]
+    with open(newest, "r+b") as f:
+        f.seek(-3, os.SEEK_END)
+        f.write(b"\xff\xfe\xfd")
+    recover(newest)
+
+    index = SegmentIndex()
+    index.refresh(newest)
+    entry = index.segments[-1]
+    assert entry["rows"] == 20
+    assert entry["first"] == MIDNIGHT + DAY
+    assert entry["last"] == MIDNIGHT + DAY + 19
+    # The lost rows no longer count as overlapping
+    assert index.overlapping(MIDNIGHT + DAY + 25) == []
+
+
+def test_index_read_skips_missing_segment(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    index = write_segments("csv")
+    os.remove(index.overlapping()[0])
+
+    records = index.read()
+    assert len(records) == 30
+    assert records["timestamp"][0] == MIDNIGHT + DAY
+
+
+def test_daily_segments_split_at_local_midnight(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    writer = SegmentedWriter("csv", flush_rows=7, fsync=False)
+    for i in range(20):
+        writer.write((MIDNIGHT + DAY - 10 + i, 21.5, 45.0, 400, 10, 400, 1, 2, 3))
+    writer.close()
+
+    segments = SegmentIndex().segments
+    assert [(s["first"], s["last"], s["rows"]) for s in segments] == [
+        (MIDNIGHT + DAY - 10, MIDNIGHT + DAY - 1, 10),
+        (MIDNIGHT + DAY, MIDNIGHT + DAY + 9, 10),
+    ]
+    for segment in segments:
+        assert len(read_history(segment["path"])) == 10
+
+
+def test_segments_follow_interval(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    writer = SegmentedWriter("binary", segment_interval=3600, flush_rows=5, fsync=False)
+    for i in range(18):  # Three hours at ten-minute steps
+        writer.write((MIDNIGHT + i * 600, 21.5, 45.0, 400, 10, 400, 1, 2, 3))
+    writer.close()
+
+    segments = SegmentIndex().segments
+    assert [s["first"] for s in segments] == [MIDNIGHT + h * 3600 for h in range(3)]
+    assert [s["rows"] for s in segments] == [6, 6, 6]
+
+
+@pytest.mark.parametrize("storage_format", FILE_FORMATS)
+def test_segments_roll_over_by_size(tmp_path, monkeypatch, storage_format):
+    monkeypatch.chdir(tmp_path)
+    index = write_segments(
+        storage_format, days=1, blocks=12, segment_interval=None, segment_bytes=256
+    )
+
+    paths = index.overlapping()
+    assert len(paths) > 1
+    assert len(set(paths)) == len(paths)
+    for path in paths[:-1]:
+        assert os.path.getsize(path) >= 256
+    assert sum(s["rows"] for s in index.segments) == 120
+    timestamps = index.read()["timestamp"]
+    assert timestamps.tolist() == [MIDNIGHT + i for i in range(120)]
+
+
+def test_overlapping_prunes_segments(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    index = write_segments("csv", days=3)
+    first, second, third = index.overlapping()
+
+    assert index.overlapping(MIDNIGHT + DAY) == [second, third]
+    assert index.overlapping(end=MIDNIGHT + 29) == [first]
+    assert index.overlapping(MIDNIGHT + 29, MIDNIGHT + DAY) == [first, second]
+    # Between the end of one day's rows and the start of the next
+    assert index.overlapping(MIDNIGHT + 100, MIDNIGHT + DAY - 1) == []
+
+    records = index.read(MIDNIGHT + 25, MIDNIGHT + DAY + 4)
+    assert len(records) == 10
+
+
+@pytest.mark.parametrize("storage_format", FILE_FORMATS)
+def test_tail_reads_back_across_segments(tmp_path, monkeypatch, storage_format):
+    monkeypatch.chdir(tmp_path)
+    index = write_segments(storage_format, days=3)
+
+    timestamps = index.tail(45)["timestamp"].tolist()
+    assert timestamps == (
+        [MIDNIGHT + DAY + i for i in range(15, 30)]
+        + [MIDNIGHT + 2 * DAY + i for i in range(30)]
+    )
+    assert len(index.tail(500)) == 90